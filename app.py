@@ -1,25 +1,57 @@
 import os
-from flask import Flask, request, jsonify
+import atexit
+import base64
+import click
+import csv
+import hmac
+import io
+import json
+import queue
+import random
+import secrets
+from flask import Flask, request, jsonify, Response, stream_with_context
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.dialects import postgresql, sqlite
 from dotenv import load_dotenv
-import bcrypt
 from datetime import datetime, timedelta, timezone
 
 import jwt
 
+from store_directory import StoreDirectory
+from score_writer import ScoreWriter
+from password_hashing import PasswordHasher, HasherBusy
+from content_bundle import ContentBundles
+from metrics import RequestMetrics
+from db_settings import engine_options, is_sqlite
+from staff_import import parse_csv, validate_records
+from quiz import QuestionBank, parse_answers, grade
+
 # Load environmental variables
 load_dotenv()
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY')
 
-# Use the SQLALCHEMY_DATABASE_URI from the environment
-app.config['SQLALCHEMY_DATABASE_URI'] = (
+# Use the SQLALCHEMY_DATABASE_URI from the environment (DATABASE_URL overrides the parts, e.g. for benchmarks)
+app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL') or (
     f"postgresql://{os.getenv('DATABASE_USER')}:{os.getenv('DATABASE_PASSWORD')}"
     f"@{os.getenv('DATABASE_HOST')}/{os.getenv('DATABASE_NAME')}"
 )
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
+# Latency, query and pool instrumentation for /metrics; SLOW_REQUEST_MS also logs slow requests with their SQL
+metrics = RequestMetrics(
+    app,
+    slow_request_ms=float(os.environ['SLOW_REQUEST_MS']) if os.getenv('SLOW_REQUEST_MS') else None,
+    n_plus_one_threshold=int(os.getenv('N_PLUS_ONE_THRESHOLD', '5'))
+)
+
+# Pool size, overflow, pre-ping and statement timeout come from the DB_* environment variables (see db_settings.py)
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config['SQLALCHEMY_DATABASE_URI'])
+if not is_sqlite(app.config['SQLALCHEMY_DATABASE_URI']):
+    # Times pool checkouts (SQLite uses its own pool classes)
+    app.config['SQLALCHEMY_ENGINE_OPTIONS']['poolclass'] = metrics.pool_class
+
 # Initialise
 db = SQLAlchemy(app)
 
@@ -50,6 +82,11 @@ class Staff(db.Model):
 
     scores = db.relationship('Score', backref='staff', lazy=True)  # Added reverse relationship for scores
 
+    # Case-insensitive uniqueness on email, as in init.sql
+    __table_args__ = (
+        db.Index('staff_email_lower_idx', db.func.lower(email), unique=True),
+    )
+
 class Score(db.Model):
     __tablename__ = 'scores'
     score_id = db.Column(db.Integer, primary_key=True)  # Adjusted to match the SQL schema
@@ -57,6 +94,11 @@ class Score(db.Model):
     staff_id = db.Column(db.Integer, db.ForeignKey('staff.staff_id'), nullable=False)  # Adjusted foreign key reference
     score = db.Column(db.Integer, nullable=False)
 
+    # Serves the newest-first history and its keyset pagination
+    __table_args__ = (
+        db.Index('scores_staff_date_idx', 'staff_id', date.desc(), score_id.desc()),
+    )
+
 class LearningResource(db.Model):
     __tablename__ = 'learning_resources'
     resource_id = db.Column(db.Integer, primary_key=True)  # Primary key
@@ -73,6 +115,528 @@ class Question(db.Model):
     followup = db.Column(db.Text, nullable=False)
     fanswer = db.Column(db.Boolean, nullable=False)
 
+# Score rollups, maintained by insert_scores and rebuilt by `flask backfill-rollups`. The store
+# columns are the staff member's store when the score was written; the backfill only knows their
+# current store, so it moves the history of anyone who has since changed store.
+class StaffDailyScore(db.Model):
+    __tablename__ = 'staff_daily_scores'
+    staff_id = db.Column(db.Integer, db.ForeignKey('staff.staff_id'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    # Copied from the store so leaderboards don't need a join
+    store_id = db.Column(db.Integer, nullable=False)
+    franchise_id = db.Column(db.Integer, nullable=False)
+    country = db.Column(db.String(100), nullable=False)
+    attempts = db.Column(db.Integer, nullable=False)
+    total_score = db.Column(db.BigInteger, nullable=False)
+    best_score = db.Column(db.Integer, nullable=False)
+
+    __table_args__ = (
+        db.Index('staff_daily_scores_store_idx', 'store_id', 'day'),
+        db.Index('staff_daily_scores_franchise_idx', 'franchise_id', 'day'),
+        db.Index('staff_daily_scores_country_idx', 'country', 'day'),
+    )
+
+# Per store per day, for the store, franchise and country summaries. Each store-day is split over
+# STORE_ROLLUP_SHARDS rows by staff_id, so concurrent score writes in one store rarely share a row lock.
+# Franchise and country summaries add up the store-day rows instead of having hot rows of their own.
+class StoreDailyScore(db.Model):
+    __tablename__ = 'store_daily_scores'
+    store_id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    shard = db.Column(db.SmallInteger, primary_key=True)
+    franchise_id = db.Column(db.Integer, nullable=False)
+    country = db.Column(db.String(100), nullable=False)
+    attempts = db.Column(db.Integer, nullable=False)
+    total_score = db.Column(db.BigInteger, nullable=False)
+
+    __table_args__ = (
+        db.Index('store_daily_scores_franchise_idx', 'franchise_id', 'day'),
+        db.Index('store_daily_scores_country_idx', 'country', 'day'),
+    )
+
+# Quiz sessions issued by /api/quiz/sessions and graded on submission
+class QuizSession(db.Model):
+    __tablename__ = 'quiz_sessions'
+    session_id = db.Column(db.String(32), primary_key=True)
+    staff_id = db.Column(db.Integer, db.ForeignKey('staff.staff_id'), nullable=False)
+    question_ids = db.Column(db.JSON, nullable=False)
+    answer_key = db.Column(db.JSON, nullable=False)  # [answer, fanswer] per question, in question_ids order
+    created_at = db.Column(db.DateTime, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False)
+    submitted_at = db.Column(db.DateTime)
+    score = db.Column(db.Integer)
+
+    __table_args__ = (
+        # Only unsubmitted sessions are ever purged, so only they are indexed
+        db.Index('quiz_sessions_unsubmitted_idx', 'expires_at',
+                 postgresql_where=submitted_at.is_(None), sqlite_where=submitted_at.is_(None)),
+    )
+
+class QuizAnswer(db.Model):
+    __tablename__ = 'quiz_answers'
+    session_id = db.Column(db.String(32), db.ForeignKey('quiz_sessions.session_id'), primary_key=True)
+    question_id = db.Column(db.Integer, primary_key=True)
+    correct = db.Column(db.Boolean, nullable=False)
+    followup_correct = db.Column(db.Boolean, nullable=False)
+
+# Per-question outcome totals, maintained on every submission so reports don't scan quiz_answers.
+# Each submission adds to one randomly picked shard, so concurrent submissions of the same
+# questions don't queue on a single row lock; reports sum the shards.
+class QuestionStat(db.Model):
+    __tablename__ = 'question_stats'
+    question_id = db.Column(db.Integer, primary_key=True)
+    shard = db.Column(db.SmallInteger, primary_key=True)
+    attempts = db.Column(db.Integer, nullable=False)
+    correct = db.Column(db.Integer, nullable=False)
+    followup_correct = db.Column(db.Integer, nullable=False)
+
+# The read queries are statements rather than session queries so the async serving mode (asgi.py) can run them too
+
+# One query for the whole hierarchy, including franchises without stores
+STORE_DIRECTORY_QUERY = db.select(Franchise.name, Store.country, Store.branch, Store.store_id) \
+                          .outerjoin(Store) \
+                          .order_by(Store.store_id)
+
+LEARNING_RESOURCES_QUERY = db.select(LearningResource.title, LearningResource.description, LearningResource.url) \
+                             .order_by(LearningResource.resource_id)
+
+QUESTIONS_QUERY = db.select(Question.question, Question.answer, Question.info, Question.followup, Question.fanswer) \
+                    .order_by(Question.question_id)
+
+QUESTION_BANK_QUERY = db.select(Question.question_id, Question.question, Question.followup,
+                                Question.answer, Question.fanswer, Question.info) \
+                        .order_by(Question.question_id)
+
+def load_store_directory():
+    return db.session.execute(STORE_DIRECTORY_QUERY).all()
+
+store_directory = StoreDirectory(load_store_directory, ttl=int(os.getenv('STORE_DIRECTORY_TTL', '300')))
+
+def compact_json(payload):
+    # What jsonify sends outside debug mode, for bodies built without it
+    return app.json.dumps(payload, separators=(',', ':'))
+
+def render_learning_resources(resources):
+    return compact_json([{
+        'title': resource.title,
+        'description': resource.description,
+        'url': resource.url
+    } for resource in resources]).encode('utf-8')
+
+def render_questions(questions):
+    return compact_json([{
+        'question': question.question,
+        'answer': question.answer,
+        'info': question.info,
+        'followup': question.followup,
+        'fanswer': question.fanswer
+    } for question in questions]).encode('utf-8')
+
+CONTENT_QUERIES = {
+    'learning_resources': (LEARNING_RESOURCES_QUERY, render_learning_resources),
+    'questions': (QUESTIONS_QUERY, render_questions),
+}
+
+# Static content is rendered and compressed once, then served from memory until the rows change
+content_bundles = ContentBundles(ttl=int(os.getenv('CONTENT_BUNDLE_TTL', '300')))
+for name, (query, render) in CONTENT_QUERIES.items():
+    content_bundles.register(name, lambda query=query, render=render: render(db.session.execute(query).all()))
+
+question_bank = QuestionBank(lambda: db.session.execute(QUESTION_BANK_QUERY).all(),
+                             ttl=int(os.getenv('CONTENT_BUNDLE_TTL', '300')))
+
+# Track which models a transaction wrote so process-local caches can be dropped on commit
+@db.event.listens_for(db.session, 'after_flush')
+def collect_written_models(session, flush_context):
+    written = session.info.setdefault('written_models', set())
+    for instance in list(session.new) + list(session.dirty) + list(session.deleted):
+        written.add(type(instance))
+
+@db.event.listens_for(db.session, 'after_commit')
+def invalidate_caches(session):
+    written = session.info.pop('written_models', set())
+    if Store in written or Franchise in written:
+        store_directory.invalidate()
+    if LearningResource in written:
+        content_bundles.invalidate('learning_resources')
+    if Question in written:
+        content_bundles.invalidate('questions')
+        question_bank.invalidate()
+
+@db.event.listens_for(db.session, 'after_rollback')
+def discard_written_models(session):
+    session.info.pop('written_models', None)
+
+def lookup_store_id(snapshot, country, franchise_name, branch):
+    if franchise_name not in snapshot.franchises:
+        return {'message': 'Franchise not found'}
+
+    store_id = snapshot.store_ids.get((country, franchise_name, branch))
+    if store_id is None:
+        return {'message': 'Store not found'}
+
+    return {'store_id': store_id}
+
+def directory_response(payload, snapshot):
+    # Clients revalidate with If-None-Match and get a 304 while the directory is unchanged
+    response = jsonify(payload)
+    response.set_etag(snapshot.version)
+    return response.make_conditional(request)
+
+# Rows per INSERT statement, keeps the bind parameter count well under driver limits
+SCORE_INSERT_CHUNK = 1000
+MAX_SCORE_BATCH = 10000
+MAX_SCORES_PAGE = 500
+EXPORT_CHUNK = 2000
+
+def parse_score_record(record):
+    # Returns a row for the scores table, or raises ValueError describing what is wrong
+    if not isinstance(record, dict) or not record.get('staff_id') or record.get('score') is None:
+        raise ValueError('Missing data')
+    # type() rather than isinstance(), which would let JSON true/false through as 1/0
+    if type(record['staff_id']) is not int or type(record['score']) is not int:
+        raise ValueError('staff_id and score must be integers')
+
+    if record.get('date'):
+        # date in yyyy-mm-dd hh:mm:ss format
+        date = datetime.strptime(record['date'], '%Y-%m-%d %H:%M:%S')
+    else:
+        date = datetime.now().replace(microsecond=0)
+
+    return {'date': date, 'staff_id': record['staff_id'], 'score': record['score']}
+
+def insert_scores(rows):
+    # Multi-row INSERT ... VALUES, one statement per chunk, inside the caller's transaction
+    for start in range(0, len(rows), SCORE_INSERT_CHUNK):
+        db.session.execute(db.insert(Score).values(rows[start:start + SCORE_INSERT_CHUNK]))
+    update_score_rollups(rows)
+
+def upsert_adding(model, rows, keys, add=(), greatest=()):
+    # INSERT ... ON CONFLICT DO UPDATE that adds the new values onto the existing row
+    if not rows:
+        return
+    insert = postgresql.insert if db.session.get_bind().dialect.name == 'postgresql' else sqlite.insert
+    # Sorted so concurrent transactions lock rows in the same order
+    rows = sorted(rows, key=lambda row: tuple(row[key] for key in keys))
+
+    for start in range(0, len(rows), SCORE_INSERT_CHUNK):
+        stmt = insert(model).values(rows[start:start + SCORE_INSERT_CHUNK])
+        updates = {column: getattr(model, column) + stmt.excluded[column] for column in add}
+        updates.update({
+            column: db.case((stmt.excluded[column] > getattr(model, column), stmt.excluded[column]),
+                            else_=getattr(model, column))
+            for column in greatest
+        })
+        db.session.execute(stmt.on_conflict_do_update(index_elements=keys, set_=updates))
+
+STORE_ROLLUP_SHARDS = int(os.getenv('STORE_ROLLUP_SHARDS', '4'))
+
+def update_score_rollups(rows):
+    staff_ids = {row['staff_id'] for row in rows}
+    scopes = {
+        staff_id: (store_id, franchise_id, country)
+        for staff_id, store_id, franchise_id, country in db.session.query(
+            Staff.staff_id, Store.store_id, Store.franchise_id, Store.country
+        ).join(Store).filter(Staff.staff_id.in_(staff_ids))
+    }
+
+    staff_days = {}
+    store_days = {}
+    for row in rows:
+        if row['staff_id'] not in scopes:
+            continue  # unknown staff, the scores insert will fail on the foreign key anyway
+        store_id, franchise_id, country = scopes[row['staff_id']]
+        day = row['date'].date()
+
+        staff_day = staff_days.setdefault((row['staff_id'], day), {
+            'staff_id': row['staff_id'], 'day': day, 'store_id': store_id, 'franchise_id': franchise_id,
+            'country': country, 'attempts': 0, 'total_score': 0, 'best_score': row['score']
+        })
+        staff_day['attempts'] += 1
+        staff_day['total_score'] += row['score']
+        staff_day['best_score'] = max(staff_day['best_score'], row['score'])
+
+        shard = row['staff_id'] % STORE_ROLLUP_SHARDS
+        store_day = store_days.setdefault((store_id, day, shard), {
+            'store_id': store_id, 'day': day, 'shard': shard, 'franchise_id': franchise_id,
+            'country': country, 'attempts': 0, 'total_score': 0
+        })
+        store_day['attempts'] += 1
+        store_day['total_score'] += row['score']
+
+    upsert_adding(StaffDailyScore, list(staff_days.values()), ['staff_id', 'day'],
+                  add=['attempts', 'total_score'], greatest=['best_score'])
+    upsert_adding(StoreDailyScore, list(store_days.values()), ['store_id', 'day', 'shard'],
+                  add=['attempts', 'total_score'])
+
+def rebuild_score_rollups():
+    day = db.func.date(Score.date)
+    db.session.query(StaffDailyScore).delete()
+    db.session.query(StoreDailyScore).delete()
+
+    db.session.execute(db.insert(StaffDailyScore).from_select(
+        ['staff_id', 'day', 'store_id', 'franchise_id', 'country', 'attempts', 'total_score', 'best_score'],
+        db.select(Score.staff_id, day, Store.store_id, Store.franchise_id, Store.country,
+                  db.func.count(), db.func.sum(Score.score), db.func.max(Score.score))
+          .join(Staff, Staff.staff_id == Score.staff_id)
+          .join(Store, Store.store_id == Staff.store_id)
+          .group_by(Score.staff_id, day, Store.store_id, Store.franchise_id, Store.country)
+    ))
+
+    # The store rollups are a second level of aggregation over the staff rollups
+    shard = StaffDailyScore.staff_id % STORE_ROLLUP_SHARDS
+    db.session.execute(db.insert(StoreDailyScore).from_select(
+        ['store_id', 'day', 'shard', 'franchise_id', 'country', 'attempts', 'total_score'],
+        db.select(StaffDailyScore.store_id, StaffDailyScore.day, shard, StaffDailyScore.franchise_id,
+                  StaffDailyScore.country, db.func.sum(StaffDailyScore.attempts),
+                  db.func.sum(StaffDailyScore.total_score))
+          .group_by(StaffDailyScore.store_id, StaffDailyScore.day, shard,
+                    StaffDailyScore.franchise_id, StaffDailyScore.country)
+    ))
+    db.session.commit()
+
+def rebuild_question_stats():
+    db.session.query(QuestionStat).delete()
+    db.session.execute(db.insert(QuestionStat).from_select(
+        ['question_id', 'shard', 'attempts', 'correct', 'followup_correct'],
+        db.select(QuizAnswer.question_id, db.literal(0), db.func.count(),
+                  db.func.sum(db.case((QuizAnswer.correct, 1), else_=0)),
+                  db.func.sum(db.case((QuizAnswer.followup_correct, 1), else_=0)))
+          .group_by(QuizAnswer.question_id)
+    ))
+    db.session.commit()
+
+@app.cli.command('backfill-rollups')
+def backfill_rollups():
+    """Rebuild the score rollups and question stats from the raw tables."""
+    rebuild_score_rollups()
+    rebuild_question_stats()
+    print(f'Rebuilt rollups: {db.session.query(StaffDailyScore).count()} staff days, '
+          f'{db.session.query(StoreDailyScore).count()} store day shards, '
+          f'{db.session.query(QuestionStat.question_id).distinct().count()} questions')
+
+def rollup_scope():
+    # Reads ?store_id=, ?franchise_id= or ?country= into a (scope, key, StaffDailyScore column) triple
+    for scope, column in (('store', StaffDailyScore.store_id),
+                          ('franchise', StaffDailyScore.franchise_id),
+                          ('country', StaffDailyScore.country)):
+        key = request.args.get('country' if scope == 'country' else f'{scope}_id')
+        if key:
+            if scope != 'country' and not key.isdigit():
+                raise ValueError(f'{scope}_id must be an integer')
+            return scope, key, column
+    raise ValueError('One of store_id, franchise_id or country is required')
+
+def rollup_window():
+    days = request.args.get('days', '30')
+    if not days.isdigit() or not 1 <= int(days) <= 366:
+        raise ValueError('days must be between 1 and 366')
+    return datetime.now().date() - timedelta(days=int(days) - 1)
+
+def flush_scores(rows):
+    with app.app_context():
+        try:
+            insert_scores(rows)
+            db.session.commit()
+            return
+        except Exception:
+            db.session.rollback()
+            if len(rows) == 1:
+                raise
+            app.logger.exception('Batch of %d scores failed, retrying one by one', len(rows))
+
+        # One bad row (e.g. an unknown staff_id) shouldn't lose the rest of the batch
+        for row in rows:
+            try:
+                insert_scores([row])
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                app.logger.exception('Dropping queued score %r', row)
+
+# Optional write-behind mode for /add-score: queue scores and insert them in batches
+score_writer = None
+if os.getenv('SCORE_WRITE_BEHIND', '').lower() in ('1', 'true', 'yes'):
+    score_writer = ScoreWriter(
+        flush_scores,
+        batch_size=int(os.getenv('SCORE_BATCH_SIZE', '500')),
+        flush_interval=float(os.getenv('SCORE_FLUSH_INTERVAL', '1.0')),
+        submit_timeout=float(os.getenv('SCORE_SUBMIT_TIMEOUT', '1.0'))
+    )
+    atexit.register(score_writer.close)
+
+QUIZ_QUESTIONS = int(os.getenv('QUIZ_QUESTIONS', '10'))
+QUIZ_SESSION_TTL = int(os.getenv('QUIZ_SESSION_TTL', '3600'))
+QUESTION_STATS_SHARDS = int(os.getenv('QUESTION_STATS_SHARDS', '16'))
+
+def record_quiz_results(session, outcomes, score, submitted_at):
+    # Claims the session, then writes the score, the per-question outcomes and the
+    # question stats; the caller commits them together
+    claimed = db.session.execute(
+        db.update(QuizSession)
+          .where(QuizSession.session_id == session.session_id,
+                 QuizSession.submitted_at.is_(None),
+                 QuizSession.expires_at > submitted_at)
+          .values(submitted_at=submitted_at, score=score)
+          .execution_options(synchronize_session=False)
+    ).rowcount
+    if not claimed:
+        raise ValueError('Quiz session was already submitted or has expired')
+
+    insert_scores([{'date': submitted_at, 'staff_id': session.staff_id, 'score': score}])
+    db.session.execute(db.insert(QuizAnswer).values([{
+        'session_id': session.session_id,
+        'question_id': question_id,
+        'correct': correct,
+        'followup_correct': followup_correct
+    } for question_id, (correct, followup_correct) in zip(session.question_ids, outcomes)]))
+    shard = random.randrange(QUESTION_STATS_SHARDS)
+    upsert_adding(QuestionStat, [{
+        'question_id': question_id,
+        'shard': shard,
+        'attempts': 1,
+        'correct': int(correct),
+        'followup_correct': int(followup_correct)
+    } for question_id, (correct, followup_correct) in zip(session.question_ids, outcomes)],
+        ['question_id', 'shard'], add=['attempts', 'correct', 'followup_correct'])
+
+@app.cli.command('purge-quiz-sessions')
+def purge_quiz_sessions():
+    """Delete quiz sessions that expired without being submitted."""
+    # Submitted sessions stay, quiz_answers refers to them and backfill-rollups reads those
+    purged = db.session.query(QuizSession).filter(
+        QuizSession.submitted_at.is_(None),
+        QuizSession.expires_at <= datetime.now()
+    ).delete(synchronize_session=False)
+    db.session.commit()
+    print(f'Purged {purged} expired quiz sessions')
+
+# Rows per /admin/import-staff request. The hashes are made while the request waits, on
+# the import share of the pool, so this has to fit in the server's request timeout;
+# bigger files go through the import-staff command
+MAX_STAFF_IMPORT = int(os.getenv('MAX_STAFF_IMPORT', '200'))
+# Imported hashes are only upgraded when their owner logs in, so they can't be made cheaper than this
+MIN_IMPORT_ROUNDS = 10
+# Emails per existence query, keeps the bind parameter count under SQLite's limit
+IMPORT_EMAIL_CHUNK = 10000
+STAFF_COLUMNS = ('full_name', 'email', 'birthday', 'store_id', 'password')
+
+def copy_staff(rows):
+    # COPY ... FROM STDIN through the session's own connection, so it commits with the session
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(
+        # An unquoted empty field is NULL in COPY's csv format
+        (row['full_name'], row['email'], row['birthday'].isoformat() if row['birthday'] else None,
+         row['store_id'], row['password'])
+        for row in rows
+    )
+    buffer.seek(0)
+    with db.session.connection().connection.cursor() as cursor:
+        cursor.copy_expert(f"COPY staff ({', '.join(STAFF_COLUMNS)}) FROM STDIN WITH (FORMAT csv)", buffer)
+
+def import_staff(records, default_store_id=None, rounds=None, hasher=None):
+    # Returns {'created': n, 'errors': [...]}; valid rows are loaded even if others fail
+    rows, errors = validate_records(records, default_store_id)
+
+    # Set-based checks instead of a query per row
+    store_ids = {row.store_id for row in rows}
+    known_stores = {store_id for store_id, in db.session.query(Store.store_id).filter(Store.store_id.in_(store_ids))}
+    email_keys = [row.email_key for row in rows]
+    registered = set()
+    for start in range(0, len(email_keys), IMPORT_EMAIL_CHUNK):
+        registered.update(email for email, in db.session.query(db.func.lower(Staff.email)).filter(
+            db.func.lower(Staff.email).in_(email_keys[start:start + IMPORT_EMAIL_CHUNK])
+        ))
+
+    accepted = []
+    for row in rows:
+        if row.store_id not in known_stores:
+            errors.append({'row': row.row, 'email': row.email, 'message': f'Unknown store_id {row.store_id}'})
+        elif row.email_key in registered:
+            errors.append({'row': row.row, 'email': row.email, 'message': 'A user with this email already exists'})
+        else:
+            accepted.append(row)
+
+    # bcrypt dominates the import; in a server process hash_many only takes its import share
+    # of the hashing pool, so logins keep going while an import runs
+    hashes = (hasher or password_hasher).hash_many([row.password for row in accepted], rounds=rounds)
+    values = [{
+        'full_name': row.full_name,
+        'email': row.email,
+        'birthday': row.birthday,
+        'store_id': row.store_id,
+        'password': hashed
+    } for row, hashed in zip(accepted, hashes)]
+
+    if values:
+        dialect = db.session.get_bind().dialect
+        try:
+            if dialect.name == 'postgresql':
+                copy_staff(values)
+            else:
+                for start in range(0, len(values), SCORE_INSERT_CHUNK):
+                    db.session.execute(db.insert(Staff).values(values[start:start + SCORE_INSERT_CHUNK]))
+            db.session.commit()
+        except (db.exc.IntegrityError, dialect.loaded_dbapi.IntegrityError):
+            # Someone registered one of these emails after we checked; nothing was loaded
+            db.session.rollback()
+            raise ValueError('An email in the import was registered while it ran, nothing was imported; please retry')
+
+    return {'created': len(values), 'errors': sorted(errors, key=lambda error: error['row'])}
+
+@app.cli.command('import-staff')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--store-id', type=int, help='store for rows without a store_id column')
+@click.option('--rounds', type=click.IntRange(MIN_IMPORT_ROUNDS, 31), help='bcrypt cost for the imported hashes')
+def import_staff_command(path, store_id, rounds):
+    """Bulk import staff from a CSV or JSON file."""
+    with open(path, encoding='utf-8-sig') as f:
+        text = f.read()
+    records = json.loads(text) if path.lower().endswith('.json') else parse_csv(text)
+    # Nothing else is hashing in this process, so the import can have every worker
+    hasher = PasswordHasher(workers=password_hasher.workers, rounds=password_hasher.rounds,
+                            import_share=max(password_hasher.workers, 1))
+    try:
+        report = import_staff(records, store_id, rounds, hasher)
+    finally:
+        hasher.shutdown()
+    print(json.dumps(report, indent=2, default=str))
+
+def is_admin():
+    token = os.getenv('ADMIN_TOKEN')
+    return bool(token) and hmac.compare_digest(request.headers.get('X-Admin-Token', ''), token)
+
+# bcrypt runs on a process pool sized to the cores; HASH_WORKERS=0 hashes inline instead
+password_hasher = PasswordHasher(
+    workers=int(os.environ['HASH_WORKERS']) if os.getenv('HASH_WORKERS') else None,
+    max_pending=int(os.getenv('HASH_MAX_PENDING', '0')) or None,
+    rounds=int(os.getenv('BCRYPT_ROUNDS', '12')),
+    import_share=int(os.getenv('HASH_IMPORT_SHARE', '0')) or None
+)
+atexit.register(password_hasher.shutdown)
+
+@app.errorhandler(HasherBusy)
+def hasher_busy(e):
+    # Shed load rather than letting logins queue behind each other
+    response = jsonify({'message': 'Server busy, please try again'})
+    response.headers['Retry-After'] = str(e.retry_after)
+    return response, 503
+
+def bundle_response(bundle):
+    encoding = request.accept_encodings.best_match(list(bundle.variants), default='identity')
+
+    if any(etag in request.if_none_match for etag in bundle.variant_etags()):
+        response = Response(status=304)
+    else:
+        response = Response(bundle.variants[encoding], mimetype='application/json')
+        if encoding != 'identity':
+            response.headers['Content-Encoding'] = encoding
+
+    response.set_etag(bundle.variant_etag(encoding))
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['Cache-Control'] = 'no-cache'  # keep a copy, but revalidate it
+    return response
+
 def generate_access_token(user_id):
     expiration = datetime.now(tz=timezone.utc) + timedelta(hours=1)
     token = jwt.encode({
@@ -109,8 +673,8 @@ def refresh():
 
 @app.route('/api/countries', methods=['GET'])
 def get_countries():
-    countries = db.session.query(Store.country).distinct().all()
-    return jsonify([country[0] for country in countries])
+    snapshot = store_directory.snapshot()
+    return directory_response(snapshot.countries, snapshot)
 
 @app.route('/api/companies', methods=['GET'])
 def get_companies():
@@ -119,14 +683,9 @@ def get_companies():
     if not country:
         return jsonify({'error': 'Country parameter is required'}), 400
 
-    # Query to get distinct franchise names based on the country
-    companies = db.session.query(Franchise.name) \
-                          .join(Store) \
-                          .filter(Store.country == country) \
-                          .distinct() \
-                          .all()
-
-    return jsonify([company[0] for company in companies])
+    # Distinct franchise names based on the country
+    snapshot = store_directory.snapshot()
+    return directory_response(snapshot.companies.get(country, []), snapshot)
 
 @app.route('/api/branches', methods=['GET'])
 def get_branches():
@@ -136,59 +695,38 @@ def get_branches():
     if not country or not company:
         return jsonify({'error': 'Both country and company parameters are required'}), 400
 
-    # Query to get distinct branches based on country and company
-    branches = db.session.query(Store.branch) \
-                         .join(Franchise) \
-                         .filter(Store.country == country, Franchise.name == company) \
-                         .distinct() \
-                         .all()
-
-    return jsonify([branch[0] for branch in branches])
+    # Distinct branches based on country and company
+    snapshot = store_directory.snapshot()
+    return directory_response(snapshot.branches.get((country, company), []), snapshot)
 
 @app.route('/api/learning-resources', methods=['GET'])
 def get_learning_resources():
-    resources = LearningResource.query.all()
-    return jsonify([{
-        'title': resource.title,
-        'description': resource.description,
-        'url': resource.url
-    } for resource in resources])
+    return bundle_response(content_bundles.get('learning_resources'))
 
 @app.route('/api/questions', methods=['GET'])
 def get_questions():
-    questions = Question.query.all()
-    return jsonify([{
-        'question': question.question,
-        'answer': question.answer,
-        'info': question.info,
-        'followup': question.followup,
-        'fanswer': question.fanswer
-    } for question in questions])
+    return bundle_response(content_bundles.get('questions'))
+
+@app.route('/api/content-version', methods=['GET'])
+def get_content_version():
+    # Lets the app check for new content without downloading it
+    return jsonify({name: content_bundles.get(name).etag for name in content_bundles.names()})
 
 @app.route('/get-store-id', methods=['POST'])
 def get_store_id():
-    data = request.get_json()
-    
+    # silent, so a malformed body gets the same 400 as in the async serving mode
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or not all(key in data for key in ('country', 'company', 'branch')):
+        return jsonify({'message': 'Missing data'}), 400
+
     country = data['country']
     franchise_name = data['company']
     branch = data['branch']
     
-    # Get the franchise ID from the franchise name
-    franchise = Franchise.query.filter_by(name=franchise_name).first()
-    if not franchise:
-        return jsonify({'message': 'Franchise not found'})
-
-    # Query the store based on country, franchise ID, and branch
-    store = Store.query.filter_by(
-        country=country,
-        franchise_id=franchise.franchise_id,  # Use franchise_id here, not franchise
-        branch=branch
-    ).first()
-
-    if not store or store == 'None':
-        return jsonify({'message': 'Store not found'})
-
-    return jsonify({'store_id': store.store_id})
+    snapshot = store_directory.snapshot()
+    response = jsonify(lookup_store_id(snapshot, country, franchise_name, branch))
+    response.set_etag(snapshot.version)
+    return response
 
 @app.route('/signup', methods=['POST'])
 def create_staff():
@@ -203,7 +741,7 @@ def create_staff():
         return jsonify({'message': 'A user with this email already exists'}), 409   # 409 Conflict
 
     # Hash the password
-    hashed_password = bcrypt.hashpw(data['password'].encode('utf-8'), bcrypt.gensalt())
+    hashed_password = password_hasher.hash(data['password'])
 
     birthday = datetime.strptime(data['birthday'], '%d/%m/%Y')
 
@@ -214,7 +752,7 @@ def create_staff():
         email=data['email'],
         birthday=formated_birthday,
         store_id=data['store_id'],
-        password=hashed_password.decode('utf-8')  # Store the hashed password as a string
+        password=hashed_password  # Store the hashed password as a string
     )
     
     db.session.add(new_staff)
@@ -227,7 +765,15 @@ def login():
     data = request.get_json()
     staff = Staff.query.filter_by(email=data['email']).first()
 
-    if staff and bcrypt.checkpw(data['password'].encode('utf-8'), staff.password.encode('utf-8')):
+    if staff and password_hasher.check(data['password'], staff.password):
+
+        # Upgrade the stored hash when BCRYPT_ROUNDS has changed since it was made
+        if password_hasher.needs_rehash(staff.password):
+            try:
+                staff.password = password_hasher.hash(data['password'])
+                db.session.commit()
+            except HasherBusy:
+                pass  # try again on a later login
 
         access_token = generate_access_token(staff.staff_id)
         refresh_token = generate_refresh_token(staff.staff_id)
@@ -243,39 +789,408 @@ def login():
 def add_score():
     data = request.get_json()
 
-    if not data['staff_id'] or not data['score']:
-        return jsonify({'message': 'Missing data'}), 400
+    try:
+        # Same checks as /add-scores, but the date is always the server's
+        row = parse_score_record({'staff_id': data.get('staff_id'), 'score': data.get('score')}
+                                 if isinstance(data, dict) else None)
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
 
-    new_score = Score(
-        # date in yyyy-mm-dd hh:mm:ssformat
-        date = datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-        staff_id=data['staff_id'],
-        score=data['score']
-    )
+    if score_writer is not None:
+        try:
+            score_writer.submit(row)
+        except queue.Full:
+            response = jsonify({'message': 'Server busy, please try again'})
+            response.headers['Retry-After'] = '1'
+            return response, 503
+        return jsonify({'message': 'Score queued'}), 202   # 202 Accepted, written by the next batch
 
-    db.session.add(new_score)
+    insert_scores([row])
     db.session.commit()
 
     return jsonify({'message': 'New score added'}), 201
 
-@app.route('/api/get-scores', methods=['POST'])
-def get_scores():
+@app.route('/add-scores', methods=['POST'])
+def add_scores():
     data = request.get_json()
+    records = data.get('scores') if isinstance(data, dict) else data
 
-    if not data or 'staff_id' not in data:
+    if not isinstance(records, list) or not records:
         return jsonify({'message': 'Missing data'}), 400
+    if len(records) > MAX_SCORE_BATCH:
+        return jsonify({'message': f'At most {MAX_SCORE_BATCH} scores per request'}), 413
 
-    staff_id = data['staff_id']
-    scores = Score.query.filter_by(staff_id=staff_id) \
-                        .order_by(Score.date.desc()) \
-                        .limit(6) \
-                        .all()
-    
+    rows = []
+    errors = []
+    for index, record in enumerate(records):
+        try:
+            rows.append(parse_score_record(record))
+        except (ValueError, TypeError) as e:
+            errors.append({'index': index, 'message': str(e)})
+
+    if errors:
+        return jsonify({'message': 'Invalid scores', 'errors': errors}), 400
+
+    try:
+        insert_scores(rows)
+        db.session.commit()
+    except db.exc.IntegrityError:
+        db.session.rollback()
+        return jsonify({'message': 'Unknown staff_id in batch'}), 409
+
+    return jsonify({'message': f'{len(rows)} scores added'}), 201
+
+def encode_score_cursor(score):
+    return base64.urlsafe_b64encode(f'{score.date.isoformat()}|{score.score_id}'.encode('utf-8')).decode('ascii')
+
+def decode_score_cursor(cursor):
+    try:
+        date, score_id = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8').split('|')
+        return datetime.fromisoformat(date), int(score_id)
+    except (ValueError, UnicodeError, AttributeError):
+        raise ValueError('Invalid cursor')
+
+def parse_score_page(data):
+    # Returns (staff_id, limit, cursor) from a /api/get-scores body, or raises ValueError
+    if not isinstance(data, dict) or 'staff_id' not in data:
+        raise ValueError('Missing data')
+    if type(data['staff_id']) is not int:
+        raise ValueError('staff_id must be an integer')
+
+    limit = data.get('limit', 6)
+    if not isinstance(limit, int) or not 1 <= limit <= MAX_SCORES_PAGE:
+        raise ValueError(f'limit must be between 1 and {MAX_SCORES_PAGE}')
+
+    cursor = decode_score_cursor(data['cursor']) if data.get('cursor') else None
+    return data['staff_id'], limit, cursor
+
+def score_page_query(staff_id, limit, cursor=None):
+    query = db.select(Score.score_id, Score.date, Score.score).where(Score.staff_id == staff_id)
+
+    # Keyset pagination on (date, score_id), newest first; the cursor is the last row of the previous page
+    if cursor is not None:
+        query = query.where(db.tuple_(Score.date, Score.score_id) < cursor)
+
+    # One extra row tells us whether there is another page
+    return query.order_by(Score.date.desc(), Score.score_id.desc()).limit(limit + 1)
+
+def score_page(scores, limit):
+    # Returns the response body and the cursor for the next page, if there is one
     # Ensure date is in a string format that the frontend expects
-    return jsonify([{
+    payload = [{
         'score': score.score,
         'date': score.date
-    } for score in scores])
+    } for score in scores[:limit]]
+    return payload, encode_score_cursor(scores[limit - 1]) if len(scores) > limit else None
+
+@app.route('/api/get-scores', methods=['POST'])
+def get_scores():
+    try:
+        staff_id, limit, cursor = parse_score_page(request.get_json())
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+
+    scores = db.session.execute(score_page_query(staff_id, limit, cursor)).all()
+    payload, next_cursor = score_page(scores, limit)
+
+    # The body stays a plain list for existing clients, the next cursor goes in a header
+    response = jsonify(payload)
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response
+
+@app.route('/api/scores/export', methods=['GET'])
+def export_scores():
+    export_format = request.args.get('format', 'ndjson')
+    if export_format not in ('ndjson', 'csv'):
+        return jsonify({'message': 'format must be ndjson or csv'}), 400
+
+    query = db.select(Score.score_id, Score.staff_id, Score.date, Score.score)
+    for param, column in (('staff_id', Score.staff_id), ('store_id', Staff.store_id), ('franchise_id', Store.franchise_id)):
+        value = request.args.get(param)
+        if value:
+            if not value.isdigit():
+                return jsonify({'message': f'{param} must be an integer'}), 400
+            if column is not Score.staff_id:
+                # Whole stores and franchises are audit data, like the staff import they need the admin token
+                if not is_admin():
+                    return jsonify({'message': 'Forbidden'}), 403
+                query = query.join(Staff, Staff.staff_id == Score.staff_id)
+            if column is Store.franchise_id:
+                query = query.join(Store, Store.store_id == Staff.store_id)
+            query = query.where(column == int(value))
+            break
+    else:
+        return jsonify({'message': 'One of staff_id, store_id or franchise_id is required'}), 400
+
+    try:
+        if request.args.get('from'):
+            query = query.where(Score.date >= datetime.strptime(request.args['from'], '%Y-%m-%d'))
+        if request.args.get('to'):
+            # to is inclusive of the whole day
+            query = query.where(Score.date < datetime.strptime(request.args['to'], '%Y-%m-%d') + timedelta(days=1))
+    except ValueError:
+        return jsonify({'message': 'from and to must be yyyy-mm-dd'}), 400
+
+    query = query.order_by(Score.date, Score.score_id)
+
+    def generate():
+        # yield_per streams from a server-side cursor, so only one chunk of rows is ever in memory
+        result = db.session.execute(query, execution_options={'yield_per': EXPORT_CHUNK})
+        if export_format == 'csv':
+            yield 'score_id,staff_id,date,score\r\n'
+        for rows in result.partitions():
+            buffer = io.StringIO()
+            if export_format == 'csv':
+                writer = csv.writer(buffer)
+                writer.writerows((row.score_id, row.staff_id, row.date.isoformat(sep=' '), row.score) for row in rows)
+            else:
+                for row in rows:
+                    buffer.write(json.dumps({
+                        'score_id': row.score_id,
+                        'staff_id': row.staff_id,
+                        'date': row.date.isoformat(sep=' '),
+                        'score': row.score
+                    }))
+                    buffer.write('\n')
+            yield buffer.getvalue()
+
+    mimetype = 'text/csv' if export_format == 'csv' else 'application/x-ndjson'
+    response = Response(stream_with_context(generate()), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename=scores.{export_format}'
+    return response
+
+@app.route('/api/score-summary', methods=['GET'])
+def get_score_summary():
+    try:
+        scope, key, column = rollup_scope()
+        since = rollup_window()
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+
+    # Same scope column on the store rollups
+    column = getattr(StoreDailyScore, column.key)
+    rollups = db.session.query(
+        StoreDailyScore.day,
+        db.func.sum(StoreDailyScore.attempts).label('attempts'),
+        db.func.sum(StoreDailyScore.total_score).label('total_score')
+    ).filter(column == (key if scope == 'country' else int(key)), StoreDailyScore.day >= since) \
+     .group_by(StoreDailyScore.day) \
+     .order_by(StoreDailyScore.day) \
+     .all()
+
+    attempts = sum(rollup.attempts for rollup in rollups)
+    total = sum(rollup.total_score for rollup in rollups)
+    return jsonify({
+        'scope': scope,
+        'key': key,
+        'since': since.isoformat(),
+        'completions': attempts,
+        'average': round(total / attempts, 2) if attempts else None,
+        'days': [{
+            'day': rollup.day.isoformat(),
+            'completions': rollup.attempts,
+            'average': round(rollup.total_score / rollup.attempts, 2)
+        } for rollup in rollups]
+    })
+
+@app.route('/api/leaderboard', methods=['GET'])
+def get_leaderboard():
+    try:
+        scope, key, column = rollup_scope()
+        since = rollup_window()
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+
+    limit = request.args.get('limit', '10')
+    if not limit.isdigit() or not 1 <= int(limit) <= 100:
+        return jsonify({'message': 'limit must be between 1 and 100'}), 400
+
+    attempts = db.func.sum(StaffDailyScore.attempts)
+    average = db.func.sum(StaffDailyScore.total_score) * 1.0 / attempts
+    leaders = db.session.query(
+        StaffDailyScore.staff_id, average.label('average'), attempts.label('attempts'),
+        db.func.max(StaffDailyScore.best_score).label('best')
+    ).filter(column == (key if scope == 'country' else int(key)), StaffDailyScore.day >= since) \
+     .group_by(StaffDailyScore.staff_id) \
+     .order_by(average.desc(), attempts.desc(), StaffDailyScore.staff_id) \
+     .limit(int(limit)) \
+     .subquery()
+
+    # Only the top-N rows are joined back to staff for their names
+    rows = db.session.query(leaders, Staff.full_name) \
+                     .join(Staff, Staff.staff_id == leaders.c.staff_id) \
+                     .order_by(leaders.c.average.desc(), leaders.c.attempts.desc(), leaders.c.staff_id) \
+                     .all()
+
+    return jsonify({
+        'scope': scope,
+        'key': key,
+        'since': since.isoformat(),
+        'leaders': [{
+            'staff_id': row.staff_id,
+            'full_name': row.full_name,
+            'average': round(float(row.average), 2),
+            'completions': row.attempts,
+            'best': row.best
+        } for row in rows]
+    })
+
+@app.route('/api/quiz/sessions', methods=['POST'])
+def create_quiz_session():
+    data = request.get_json()
+
+    if not isinstance(data, dict) or not isinstance(data.get('staff_id'), int):
+        return jsonify({'message': 'Missing data'}), 400
+    count = data.get('count', QUIZ_QUESTIONS)
+    if not isinstance(count, int) or count < 1:
+        return jsonify({'message': 'count must be a positive integer'}), 400
+
+    bank = question_bank.snapshot()
+    if not bank.question_ids:
+        return jsonify({'message': 'No questions available'}), 404
+
+    question_ids, answer_key = bank.draw(count)
+    created_at = datetime.now().replace(microsecond=0)
+    session = QuizSession(
+        session_id=secrets.token_urlsafe(16),
+        staff_id=data['staff_id'],
+        question_ids=question_ids,
+        answer_key=answer_key,
+        created_at=created_at,
+        expires_at=created_at + timedelta(seconds=QUIZ_SESSION_TTL)
+    )
+    db.session.add(session)
+    try:
+        db.session.commit()
+    except db.exc.IntegrityError:
+        db.session.rollback()
+        return jsonify({'message': 'Staff not found'}), 404
+
+    return jsonify({
+        'session_id': session.session_id,
+        'expires_at': session.expires_at.isoformat(),
+        'questions': [bank.public[question_id] for question_id in question_ids]
+    }), 201
+
+@app.route('/api/quiz/sessions/<session_id>/submit', methods=['POST'])
+def submit_quiz_session(session_id):
+    data = request.get_json()
+    session = db.session.get(QuizSession, session_id)
+
+    if session is None:
+        return jsonify({'message': 'Quiz session not found'}), 404
+    if session.submitted_at is not None:
+        return jsonify({'message': 'Quiz session already submitted'}), 409
+
+    submitted_at = datetime.now().replace(microsecond=0)
+    if session.expires_at <= submitted_at:
+        return jsonify({'message': 'Quiz session expired'}), 410
+
+    try:
+        submitted = parse_answers(session.question_ids, data.get('answers') if isinstance(data, dict) else None)
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+
+    outcomes, score = grade(session.answer_key, submitted)
+    try:
+        record_quiz_results(session, outcomes, score, submitted_at)
+        db.session.commit()
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({'message': str(e)}), 409
+
+    # Answers and explanations are only revealed once the session is graded
+    info = question_bank.snapshot().info
+    return jsonify({
+        'score': score,
+        'results': [{
+            'question_id': question_id,
+            'correct': correct,
+            'followup_correct': followup_correct,
+            'answer': answer,
+            'fanswer': fanswer,
+            'info': info.get(question_id)
+        } for question_id, (correct, followup_correct), (answer, fanswer)
+          in zip(session.question_ids, outcomes, session.answer_key)]
+    }), 201
+
+@app.route('/api/questions/most-missed', methods=['GET'])
+def get_most_missed_questions():
+    limit = request.args.get('limit', '10')
+    min_attempts = request.args.get('min_attempts', '1')
+    if not limit.isdigit() or not 1 <= int(limit) <= 100:
+        return jsonify({'message': 'limit must be between 1 and 100'}), 400
+    if not min_attempts.isdigit():
+        return jsonify({'message': 'min_attempts must be an integer'}), 400
+
+    attempts = db.func.sum(QuestionStat.attempts)
+    correct = db.func.sum(QuestionStat.correct)
+    followup_correct = db.func.sum(QuestionStat.followup_correct)
+    # Share of answers (main and follow-up) that were wrong
+    missed = (2 * attempts - correct - followup_correct) * 1.0 / (2 * attempts)
+    stats = db.session.query(
+        QuestionStat.question_id, attempts.label('attempts'), correct.label('correct'),
+        followup_correct.label('followup_correct'), missed.label('missed')
+    ).group_by(QuestionStat.question_id) \
+     .having(attempts >= max(int(min_attempts), 1)) \
+     .order_by(missed.desc(), attempts.desc(), QuestionStat.question_id) \
+     .limit(int(limit)) \
+     .subquery()
+
+    # Only the top-N questions are joined for their text
+    rows = db.session.query(stats, Question.question, Question.followup) \
+                     .join(Question, Question.question_id == stats.c.question_id) \
+                     .order_by(stats.c.missed.desc(), stats.c.attempts.desc(), stats.c.question_id) \
+                     .all()
+
+    return jsonify([{
+        'question_id': stat.question_id,
+        'question': stat.question,
+        'followup': stat.followup,
+        'attempts': stat.attempts,
+        'missed': stat.attempts - stat.correct,
+        'followup_missed': stat.attempts - stat.followup_correct,
+        'missed_rate': round((stat.attempts - stat.correct) / stat.attempts, 3),
+        'followup_missed_rate': round((stat.attempts - stat.followup_correct) / stat.attempts, 3)
+    } for stat in rows])
+
+@app.route('/admin/import-staff', methods=['POST'])
+def admin_import_staff():
+    if not is_admin():
+        return jsonify({'message': 'Forbidden'}), 403
+
+    default_store_id = request.args.get('store_id')
+    try:
+        if request.mimetype == 'text/csv':
+            records = parse_csv(request.get_data(as_text=True))
+        else:
+            data = request.get_json()
+            records = data.get('staff') if isinstance(data, dict) else data
+            if isinstance(data, dict):
+                default_store_id = default_store_id or data.get('store_id')
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+
+    if not isinstance(records, list) or not records:
+        return jsonify({'message': 'Missing data'}), 400
+    if len(records) > MAX_STAFF_IMPORT:
+        return jsonify({'message': f'At most {MAX_STAFF_IMPORT} staff per request, use the import-staff command for bigger files'}), 413
+
+    rounds = request.args.get('rounds', type=int)
+    if rounds is not None and not MIN_IMPORT_ROUNDS <= rounds <= 31:
+        return jsonify({'message': f'rounds must be between {MIN_IMPORT_ROUNDS} and 31'}), 400
+
+    try:
+        report = import_staff(records, default_store_id, rounds)
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 409
+
+    return jsonify(report), 200
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
 
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=3000)
\ No newline at end of file
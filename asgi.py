@@ -0,0 +1,188 @@
+"""Production serving mode: async read paths in front of the Flask app, under an ASGI server.
+
+    WEB_CONCURRENCY=4 uvicorn asgi:create_app --factory --host 0.0.0.0 --port 3000 --timeout-graceful-shutdown 30
+
+The hot read paths (the store directory lookups, /api/get-scores and the content
+endpoints) are served here with SQLAlchemy's async engine, so a request waiting
+on PostgreSQL doesn't hold a thread. Every other route falls through to the
+Flask app from app.py, run on a bounded thread pool. `python app.py` still runs
+the plain sync app. Set the process count with WEB_CONCURRENCY rather than
+--workers, so the password hashing pools split the cores between processes.
+
+On shutdown (SIGTERM, once the server has finished in-flight requests) the
+async engine's connections are closed, queued write-behind scores are flushed
+and the password hashing pool is stopped.
+"""
+import contextlib
+import os
+import time
+
+import anyio
+from a2wsgi import WSGIMiddleware
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from starlette.applications import Starlette
+from starlette.responses import Response
+from starlette.routing import Mount, Route
+from werkzeug.datastructures import Accept
+from werkzeug.http import parse_accept_header, parse_etags
+
+import app as backend
+from db_settings import async_url, engine_options, is_sqlite
+
+
+def json_response(payload, status_code=200, headers=None):
+    # Same serializer (and trailing newline) as jsonify, so both modes return identical bodies
+    return Response(backend.compact_json(payload) + '\n', status_code=status_code,
+                    media_type='application/json', headers=headers)
+
+
+def not_modified(request, *etags):
+    if_none_match = parse_etags(request.headers.get('if-none-match'))
+    return any(etag in if_none_match for etag in etags)
+
+
+async def read_json(request):
+    try:
+        return await request.json()
+    except ValueError:
+        return None
+
+
+class ReadPaths:
+    def __init__(self, engine):
+        self.engine = engine
+
+    async def directory(self):
+        snapshot = backend.store_directory.cached()
+        if snapshot is None:
+            generation = backend.store_directory.begin_load()
+            async with self.engine.connect() as conn:
+                rows = (await conn.execute(backend.STORE_DIRECTORY_QUERY)).all()
+            snapshot = backend.store_directory.finish_load(generation, rows)
+        return snapshot
+
+    async def bundle(self, name):
+        bundle = backend.content_bundles.cached(name)
+        if bundle is None:
+            generation = backend.content_bundles.begin_load(name)
+            query, render = backend.CONTENT_QUERIES[name]
+            async with self.engine.connect() as conn:
+                rows = (await conn.execute(query)).all()
+            bundle = backend.content_bundles.finish_load(name, generation, render(rows))
+        return bundle
+
+    async def directory_response(self, request, payload):
+        snapshot = await self.directory()
+        headers = {'ETag': f'"{snapshot.version}"'}
+        if not_modified(request, snapshot.version):
+            return Response(status_code=304, headers=headers)
+        return json_response(payload(snapshot), headers=headers)
+
+    async def countries(self, request):
+        return await self.directory_response(request, lambda snapshot: snapshot.countries)
+
+    async def companies(self, request):
+        country = request.query_params.get('country')
+        if not country:
+            return json_response({'error': 'Country parameter is required'}, 400)
+        return await self.directory_response(request, lambda snapshot: snapshot.companies.get(country, []))
+
+    async def branches(self, request):
+        country = request.query_params.get('country')
+        company = request.query_params.get('company')
+        if not country or not company:
+            return json_response({'error': 'Both country and company parameters are required'}, 400)
+        return await self.directory_response(request, lambda snapshot: snapshot.branches.get((country, company), []))
+
+    async def store_id(self, request):
+        data = await read_json(request)
+        if not isinstance(data, dict) or not all(key in data for key in ('country', 'company', 'branch')):
+            return json_response({'message': 'Missing data'}, 400)
+
+        snapshot = await self.directory()
+        return json_response(backend.lookup_store_id(snapshot, data['country'], data['company'], data['branch']),
+                             headers={'ETag': f'"{snapshot.version}"'})
+
+    async def content(self, request, name):
+        bundle = await self.bundle(name)
+        encoding = parse_accept_header(request.headers.get('accept-encoding'), Accept) \
+            .best_match(list(bundle.variants), default='identity')
+        headers = {
+            'ETag': f'"{bundle.variant_etag(encoding)}"',
+            'Vary': 'Accept-Encoding',
+            'Cache-Control': 'no-cache',
+        }
+        if not_modified(request, *bundle.variant_etags()):
+            return Response(status_code=304, headers=headers)
+        if encoding != 'identity':
+            headers['Content-Encoding'] = encoding
+        return Response(bundle.variants[encoding], media_type='application/json', headers=headers)
+
+    async def questions(self, request):
+        return await self.content(request, 'questions')
+
+    async def learning_resources(self, request):
+        return await self.content(request, 'learning_resources')
+
+    async def content_version(self, request):
+        return json_response({name: (await self.bundle(name)).etag for name in backend.content_bundles.names()})
+
+    async def scores(self, request):
+        try:
+            staff_id, limit, cursor = backend.parse_score_page(await read_json(request))
+        except ValueError as e:
+            return json_response({'message': str(e)}, 400)
+
+        async with self.engine.connect() as conn:
+            scores = (await conn.execute(backend.score_page_query(staff_id, limit, cursor))).all()
+        payload, next_cursor = backend.score_page(scores, limit)
+        return json_response(payload, headers={'X-Next-Cursor': next_cursor} if next_cursor else None)
+
+
+def timed(route, endpoint):
+    # The Flask hooks in metrics.py don't see these requests, so record them here
+    async def handler(request):
+        started = time.perf_counter()
+        response = await endpoint(request)
+        backend.metrics.request_duration.observe(time.perf_counter() - started, request.method, route)
+        backend.metrics.requests.inc(request.method, route, str(response.status_code))
+        return response
+    return handler
+
+
+def create_app():
+    url = backend.app.config['SQLALCHEMY_DATABASE_URI']
+    options = engine_options(url, use_async=True)
+    if not is_sqlite(url):
+        options['poolclass'] = backend.metrics.timed_pool_class(AsyncAdaptedQueuePool)
+    engine = create_async_engine(async_url(url), **options)
+    reads = ReadPaths(engine)
+
+    @contextlib.asynccontextmanager
+    async def lifespan(app):
+        yield
+        await engine.dispose()
+        # Both block (draining the queue can take up to its 30 s timeout), so keep them off the event loop
+        if backend.score_writer is not None:
+            await anyio.to_thread.run_sync(backend.score_writer.close)
+        await anyio.to_thread.run_sync(backend.password_hasher.shutdown)
+
+    routes = [
+        ('/api/countries', ['GET'], reads.countries),
+        ('/api/companies', ['GET'], reads.companies),
+        ('/api/branches', ['GET'], reads.branches),
+        ('/get-store-id', ['POST'], reads.store_id),
+        ('/api/questions', ['GET'], reads.questions),
+        ('/api/learning-resources', ['GET'], reads.learning_resources),
+        ('/api/content-version', ['GET'], reads.content_version),
+        ('/api/get-scores', ['POST'], reads.scores),
+    ]
+
+    return Starlette(
+        routes=[Route(path, timed(path, endpoint), methods=methods) for path, methods, endpoint in routes] + [
+            # Everything else is the sync Flask app on a thread pool
+            Mount('/', app=WSGIMiddleware(backend.app, workers=int(os.getenv('WSGI_THREADS', '10'))))
+        ],
+        lifespan=lifespan
+    )
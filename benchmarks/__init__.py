@@ -0,0 +1,89 @@
+"""Benchmarks for the Hairtite backend.
+
+Each module is runnable with ``python -m benchmarks.<name>`` from the repository
+root and prints its results as JSON. They run against DATABASE_URL when it is
+set, otherwise against a throwaway SQLite file, so numbers from SQLite are only
+useful for comparing modes with each other, not for absolute capacity.
+"""
+import importlib
+import json
+import os
+import tempfile
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.serving import BaseWSGIServer
+
+
+def load_app(database_url=None, **env):
+    # app.py reads its configuration at import time, so set it up before importing
+    if database_url is None:
+        database_url = os.getenv('DATABASE_URL') or \
+            f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='hairtite-bench-'), 'bench.db')}"
+    os.environ['DATABASE_URL'] = database_url
+    os.environ.setdefault('SECRET_KEY', 'benchmark')
+    os.environ.update({key: str(value) for key, value in env.items()})
+
+    module = importlib.import_module('app')
+    with module.app.app_context():
+        module.db.create_all()
+    return module
+
+
+def seed_staff(module, count=1):
+    # Minimal franchise/store/staff rows so scores have something to point at
+    with module.app.app_context():
+        franchise = module.Franchise(name='Benchmark Franchise')
+        store = module.Store(country='United Kingdom', franchise=franchise, branch='Benchmark Branch')
+        staff = [module.Staff(
+            full_name=f'Benchmark Staff {i}',
+            email=f'bench{i}@example.com',
+            store=store,
+            password='not-a-real-hash'
+        ) for i in range(count)]
+        module.db.session.add_all(staff)
+        module.db.session.commit()
+        return [member.staff_id for member in staff]
+
+
+def percentiles(samples, points=(50, 95, 99)):
+    # Nearest-rank percentiles in milliseconds from a list of durations in seconds
+    if not samples:
+        return {f'p{point}': None for point in points}
+    ordered = sorted(samples)
+    return {
+        f'p{point}': round(ordered[min(len(ordered) - 1, max(0, -(-point * len(ordered) // 100) - 1))] * 1000, 2)
+        for point in points
+    }
+
+
+class PooledWSGIServer(BaseWSGIServer):
+    # Handles each connection on a bounded thread pool, so slow requests can tie up every worker
+    def __init__(self, host, port, app, threads):
+        super().__init__(host, port, app)
+        self._executor = ThreadPoolExecutor(max_workers=threads)
+
+    def process_request(self, request, client_address):
+        self._executor.submit(self._handle, request, client_address)
+
+    def _handle(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+
+def http_request(url, data=None, headers=None):
+    # Returns the status code, reading the body so the timing includes the transfer
+    body = None if data is None else json.dumps(data).encode('utf-8')
+    req = urllib.request.Request(url, data=body, headers={'Content-Type': 'application/json', **(headers or {})})
+    try:
+        with urllib.request.urlopen(req, timeout=60) as response:
+            response.read()
+            return response.status
+    except urllib.error.HTTPError as e:
+        e.read()
+        return e.code
@@ -0,0 +1,49 @@
+"""Compares two benchmarks.loadtest reports route by route.
+
+    python -m benchmarks.compare before.json after.json --threshold 10
+
+Exits with status 1 if any route's p99 got more than --threshold percent worse,
+so it can gate a CI job.
+"""
+import argparse
+import json
+import sys
+
+
+def change(before, after):
+    if not before or after is None:
+        return None
+    return round((after - before) / before * 100, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('before')
+    parser.add_argument('after')
+    parser.add_argument('--threshold', type=float, default=10.0, help='allowed p99 regression in percent')
+    args = parser.parse_args()
+
+    with open(args.before) as f:
+        before = json.load(f)
+    with open(args.after) as f:
+        after = json.load(f)
+
+    print(f"{'route':<20}{'rps':>10}{'Δ%':>8}{'p50 ms':>10}{'Δ%':>8}{'p99 ms':>10}{'Δ%':>8}")
+    regressions = []
+    for route in sorted(set(before['routes']) & set(after['routes'])) + ['total']:
+        old = before['total'] if route == 'total' else before['routes'][route]
+        new = after['total'] if route == 'total' else after['routes'][route]
+        p99_change = change(old['p99'], new['p99'])
+        print(f"{route:<20}{new['throughput_rps']:>10}{change(old['throughput_rps'], new['throughput_rps']) or 0:>8}"
+              f"{new['p50'] or 0:>10}{change(old['p50'], new['p50']) or 0:>8}"
+              f"{new['p99'] or 0:>10}{p99_change or 0:>8}")
+        if p99_change is not None and p99_change > args.threshold:
+            regressions.append(route)
+
+    if regressions:
+        print(f"p99 regressed by more than {args.threshold}% on: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
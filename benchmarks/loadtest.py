@@ -0,0 +1,237 @@
+"""Replays a weighted mix of the app's routes at fixed concurrency and reports per-route latency.
+
+By default it seeds DATABASE_URL with benchmarks.synthetic and serves the app
+in-process on a server with --server-threads request threads. Like
+benchmarks.synthetic it refuses to seed a database that already has staff
+unless --reset is given, which drops and recreates every table. With --no-seed
+it uses whatever is already in DATABASE_URL, and with --url it sends the
+traffic to an already running server instead (sample data is still read from,
+and seeded into, DATABASE_URL).
+
+    python -m benchmarks.loadtest --scale small --concurrency 16 --duration 30 --reset --output before.json
+
+The report is JSON: throughput and p50/p95/p99 latency per route and overall,
+plus the git commit and settings, so two runs can be compared with
+benchmarks.compare.
+"""
+import argparse
+import json
+import logging
+import random
+import subprocess
+import threading
+import time
+from datetime import datetime, timezone
+from urllib.parse import urlencode
+
+from benchmarks import PooledWSGIServer, http_request, load_app, percentiles
+from benchmarks import synthetic
+
+# Relative weights, roughly what a fleet of app clients sends
+DEFAULT_MIX = {
+    'countries': 3,
+    'companies': 3,
+    'branches': 3,
+    'get-store-id': 3,
+    'login': 2,
+    'add-score': 20,
+    'get-scores': 25,
+    'questions': 15,
+    'learning-resources': 10,
+    'content-version': 8,
+    'score-summary': 4,
+    'leaderboard': 4,
+}
+
+COMPRESSED = {'Accept-Encoding': 'br, gzip'}
+
+
+class Samples:
+    def __init__(self, module, limit=10000):
+        # Real keys to build requests from, so lookups hit rows that exist
+        with module.app.app_context():
+            snapshot = module.store_directory.snapshot()
+            self.stores = sorted(snapshot.store_ids.items())
+            self.staff = module.db.session.query(module.Staff.staff_id, module.Staff.email) \
+                                          .order_by(module.Staff.staff_id) \
+                                          .limit(limit) \
+                                          .all()
+        if not self.stores or not self.staff:
+            raise SystemExit('No stores or staff to test with, seed the database first')
+
+
+def build_request(route, samples, rng):
+    # Returns (path, json body or None, extra headers)
+    (country, company, branch), store_id = rng.choice(samples.stores)
+    staff_id, email = rng.choice(samples.staff)
+
+    if route == 'countries':
+        return '/api/countries', None, {}
+    if route == 'companies':
+        return '/api/companies?' + urlencode({'country': country}), None, {}
+    if route == 'branches':
+        return '/api/branches?' + urlencode({'country': country, 'company': company}), None, {}
+    if route == 'get-store-id':
+        return '/get-store-id', {'country': country, 'company': company, 'branch': branch}, {}
+    if route == 'login':
+        return '/login', {'email': email, 'password': synthetic.PASSWORD}, {}
+    if route == 'add-score':
+        return '/add-score', {'staff_id': staff_id, 'score': rng.randint(40, 100)}, {}
+    if route == 'get-scores':
+        return '/api/get-scores', {'staff_id': staff_id}, {}
+    if route == 'questions':
+        return '/api/questions', None, COMPRESSED
+    if route == 'learning-resources':
+        return '/api/learning-resources', None, COMPRESSED
+    if route == 'content-version':
+        return '/api/content-version', None, {}
+    if route == 'score-summary':
+        return '/api/score-summary?' + urlencode({'store_id': store_id}), None, {}
+    if route == 'leaderboard':
+        return '/api/leaderboard?' + urlencode({'country': country}), None, {}
+    raise ValueError(f'Unknown route {route}')
+
+
+def parse_mix(value):
+    # "login=5,add-score=20" overrides those weights, 0 removes a route
+    mix = dict(DEFAULT_MIX)
+    for item in filter(None, (value or '').split(',')):
+        route, _, weight = item.partition('=')
+        if route not in DEFAULT_MIX:
+            raise argparse.ArgumentTypeError(f'Unknown route {route}, expected one of {", ".join(DEFAULT_MIX)}')
+        mix[route] = float(weight)
+    return {route: weight for route, weight in mix.items() if weight > 0}
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(base, samples, mix, concurrency, duration, warmup, seed):
+    routes = list(mix)
+    weights = [mix[route] for route in routes]
+    latencies = {route: [] for route in routes}
+    statuses = {route: {} for route in routes}
+    lock = threading.Lock()
+
+    started = time.monotonic()
+    measure_from = started + warmup
+    stop = measure_from + duration
+
+    def client(index):
+        rng = random.Random(seed * 1000 + index)
+        while True:
+            now = time.monotonic()
+            if now >= stop:
+                return
+            route = rng.choices(routes, weights)[0]
+            path, body, headers = build_request(route, samples, rng)
+
+            request_started = time.perf_counter()
+            status = http_request(base + path, body, headers)
+            elapsed = time.perf_counter() - request_started
+
+            if now >= measure_from:
+                with lock:
+                    latencies[route].append(elapsed)
+                    statuses[route][status] = statuses[route].get(status, 0) + 1
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    report = {}
+    for route in routes:
+        errors = sum(count for status, count in statuses[route].items() if status >= 500)
+        report[route] = {
+            'requests': len(latencies[route]),
+            'errors': errors,
+            'throughput_rps': round(len(latencies[route]) / duration, 2),
+            **percentiles(latencies[route]),
+            'statuses': {str(status): count for status, count in sorted(statuses[route].items())},
+        }
+
+    everything = [latency for route in routes for latency in latencies[route]]
+    total = {
+        'requests': len(everything),
+        'errors': sum(route['errors'] for route in report.values()),
+        'throughput_rps': round(len(everything) / duration, 2),
+        **percentiles(everything),
+    }
+    return total, report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    synthetic.add_arguments(parser)
+    parser.add_argument('--no-seed', action='store_true', help='use the data already in DATABASE_URL')
+    parser.add_argument('--reset', action='store_true', help='drop and recreate every table before seeding')
+    parser.add_argument('--url', help='send traffic to this running server instead of an in-process one')
+    parser.add_argument('--server-threads', type=int, default=16)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=30.0, help='measured seconds')
+    parser.add_argument('--warmup', type=float, default=3.0, help='unmeasured seconds before that')
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix(None),
+                        help='route weights to override, e.g. "login=5,leaderboard=0"')
+    parser.add_argument('--output', help='write the JSON report here as well as to stdout')
+    args = parser.parse_args()
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    module = load_app(BCRYPT_ROUNDS=args.bcrypt_rounds)
+
+    data = None
+    if not args.no_seed:
+        with module.app.app_context():
+            synthetic.prepare_database(module, args.reset)
+            data = synthetic.generate_from_args(module, args)
+    samples = Samples(module)
+
+    server = None
+    base = args.url
+    if base is None:
+        server = PooledWSGIServer('127.0.0.1', 0, module.app, args.server_threads)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base = f'http://127.0.0.1:{server.server_port}'
+
+    try:
+        total, routes = run(base.rstrip('/'), samples, args.mix, args.concurrency,
+                            args.duration, args.warmup, args.seed)
+    finally:
+        if server is not None:
+            server.shutdown()
+
+    with module.app.app_context():
+        database = module.db.engine.dialect.name
+
+    report = {
+        'commit': git_commit(),
+        'started_at': datetime.now(tz=timezone.utc).isoformat(timespec='seconds'),
+        'config': {
+            'database': database,
+            'url': args.url,
+            'server_threads': None if args.url else args.server_threads,
+            'concurrency': args.concurrency,
+            'duration': args.duration,
+            'warmup': args.warmup,
+            'seed': args.seed,
+            'mix': args.mix,
+        },
+        'data': data,
+        'total': total,
+        'routes': routes,
+    }
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+"""Latency of a cheap endpoint (/api/questions) while a storm of /login requests runs.
+
+Runs the app on a local HTTP server with a fixed number of request threads, like
+a sync deployment with that many workers, once with bcrypt inline on the request
+thread and once with the hashing pool and its admission control. A third case
+measures single /login requests while a bulk staff import hashes --import-size
+passwords on the same pool.
+
+    python -m benchmarks.login_storm --duration 10 --login-clients 16 --server-threads 8
+"""
+import argparse
+import json
+import logging
+import sys
+import threading
+import time
+
+from benchmarks import PooledWSGIServer, http_request, load_app, percentiles, seed_staff
+from password_hashing import PasswordHasher
+
+
+def run_mode(module, hasher, args, email):
+    module.password_hasher = hasher
+    server = PooledWSGIServer('127.0.0.1', 0, module.app, args.server_threads)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f'http://127.0.0.1:{server.server_port}'
+
+    stop = time.monotonic() + args.duration
+    statuses = {}
+    statuses_lock = threading.Lock()
+    probe_latencies = []
+
+    def storm():
+        while time.monotonic() < stop:
+            status = http_request(f'{base}/login', {'email': email, 'password': 'benchmark-password'})
+            with statuses_lock:
+                statuses[status] = statuses.get(status, 0) + 1
+
+    def probe():
+        while time.monotonic() < stop:
+            started = time.perf_counter()
+            http_request(f'{base}/api/questions')
+            probe_latencies.append(time.perf_counter() - started)
+            time.sleep(args.probe_interval)
+
+    threads = [threading.Thread(target=storm) for _ in range(args.login_clients)]
+    threads.append(threading.Thread(target=probe))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    server.shutdown()
+    hasher.shutdown()
+    return {
+        'questions_latency_ms': percentiles(probe_latencies),
+        'questions_requests': len(probe_latencies),
+        'login_statuses': {str(status): count for status, count in sorted(statuses.items())},
+    }
+
+
+def run_import(module, hasher, args, email):
+    # Logins one after another while hash_many works through an import-sized batch
+    module.password_hasher = hasher
+    server = PooledWSGIServer('127.0.0.1', 0, module.app, args.server_threads)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f'http://127.0.0.1:{server.server_port}'
+
+    done = threading.Event()
+    import_seconds = []
+
+    def bulk_import():
+        started = time.perf_counter()
+        hasher.hash_many(['benchmark-password'] * args.import_size, rounds=args.rounds)
+        import_seconds.append(time.perf_counter() - started)
+        done.set()
+
+    importer = threading.Thread(target=bulk_import)
+    importer.start()
+    latencies = []
+    statuses = {}
+    while not done.is_set():
+        started = time.perf_counter()
+        status = http_request(f'{base}/login', {'email': email, 'password': 'benchmark-password'})
+        latencies.append(time.perf_counter() - started)
+        statuses[status] = statuses.get(status, 0) + 1
+        time.sleep(args.probe_interval)
+    importer.join()
+
+    server.shutdown()
+    hasher.shutdown()
+    return {
+        'import_size': args.import_size,
+        'import_seconds': round(import_seconds[0], 2),
+        'import_share': hasher.import_share,
+        'login_latency_ms': percentiles(latencies),
+        'login_statuses': {str(status): count for status, count in sorted(statuses.items())},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds per mode')
+    parser.add_argument('--login-clients', type=int, default=16)
+    parser.add_argument('--server-threads', type=int, default=8)
+    parser.add_argument('--hash-workers', type=int, default=None, help='defaults to the number of cores')
+    parser.add_argument('--max-pending', type=int, default=None,
+                        help='defaults to the number of workers, capped at half the server threads')
+    parser.add_argument('--rounds', type=int, default=12)
+    parser.add_argument('--probe-interval', type=float, default=0.05)
+    parser.add_argument('--import-size', type=int, default=80, help='passwords hashed by the import case, 0 to skip')
+    args = parser.parse_args()
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    module = load_app(BCRYPT_ROUNDS=args.rounds)
+    staff_id = seed_staff(module)[0]
+    with module.app.app_context():
+        staff = module.db.session.get(module.Staff, staff_id)
+        staff.password = PasswordHasher(workers=0, rounds=args.rounds).hash('benchmark-password')
+        module.db.session.commit()
+        email = staff.email
+
+    workers = PasswordHasher(workers=args.hash_workers).workers
+    # Admission has to stay below the request threads, or the storm holds every thread and nothing is shed
+    max_pending = args.max_pending or max(1, min(workers, args.server_threads // 2))
+    if max_pending >= args.server_threads:
+        print(f'warning: --max-pending {max_pending} >= --server-threads {args.server_threads}, '
+              'logins can occupy every request thread', file=sys.stderr)
+    pooled = PasswordHasher(workers=workers, max_pending=max_pending, rounds=args.rounds)
+    results = {
+        'duration': args.duration,
+        'login_clients': args.login_clients,
+        'server_threads': args.server_threads,
+        'rounds': args.rounds,
+        'hash_workers': pooled.workers,
+        'max_pending': pooled.max_pending,
+        'modes': {
+            # Effectively unbounded admission, which is what inline hashing amounted to
+            'inline': run_mode(module, PasswordHasher(workers=0, max_pending=10 ** 6, rounds=args.rounds), args, email),
+            'pool': run_mode(module, pooled, args, email),
+        },
+    }
+    if args.import_size:
+        results['login_during_import'] = run_import(
+            module, PasswordHasher(workers=workers, max_pending=max_pending, rounds=args.rounds), args, email)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
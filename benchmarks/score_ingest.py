@@ -0,0 +1,78 @@
+"""Inserts per second for /add-score, /add-scores and write-behind /add-score.
+
+    python -m benchmarks.score_ingest --count 5000 --batch-size 500
+"""
+import argparse
+import json
+import time
+
+from benchmarks import load_app, seed_staff
+from score_writer import ScoreWriter
+
+
+def count_scores(module):
+    with module.app.app_context():
+        return module.db.session.query(module.Score).count()
+
+
+def run_single(module, client, staff_ids, count):
+    for i in range(count):
+        client.post('/add-score', json={'staff_id': staff_ids[i % len(staff_ids)], 'score': 80})
+
+
+def run_batched(module, client, staff_ids, count, batch_size):
+    for start in range(0, count, batch_size):
+        client.post('/add-scores', json={'scores': [
+            {'staff_id': staff_ids[i % len(staff_ids)], 'score': 80}
+            for i in range(start, min(start + batch_size, count))
+        ]})
+
+
+def run_write_behind(module, client, staff_ids, count, batch_size):
+    module.score_writer = ScoreWriter(module.flush_scores, batch_size=batch_size, flush_interval=0.5)
+    try:
+        for i in range(count):
+            client.post('/add-score', json={'staff_id': staff_ids[i % len(staff_ids)], 'score': 80})
+    finally:
+        # Include the drain, the rows only count once they are in the table
+        module.score_writer.close()
+        module.score_writer = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--count', type=int, default=5000, help='scores to insert per mode')
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--staff', type=int, default=50)
+    args = parser.parse_args()
+
+    module = load_app()
+    staff_ids = seed_staff(module, args.staff)
+    client = module.app.test_client()
+
+    modes = {
+        'single': lambda: run_single(module, client, staff_ids, args.count),
+        'batched': lambda: run_batched(module, client, staff_ids, args.count, args.batch_size),
+        'write_behind': lambda: run_write_behind(module, client, staff_ids, args.count, args.batch_size),
+    }
+
+    with module.app.app_context():
+        database = module.db.engine.dialect.name
+    results = {'count': args.count, 'batch_size': args.batch_size, 'database': database, 'modes': {}}
+    for name, run in modes.items():
+        before = count_scores(module)
+        started = time.perf_counter()
+        run()
+        elapsed = time.perf_counter() - started
+        inserted = count_scores(module) - before
+        results['modes'][name] = {
+            'inserted': inserted,
+            'seconds': round(elapsed, 3),
+            'inserts_per_second': round(inserted / elapsed, 1),
+        }
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
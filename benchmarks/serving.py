@@ -0,0 +1,124 @@
+"""Read-path throughput of the sync (threaded WSGI) and async (uvicorn + asgi.py) serving modes.
+
+Seeds DATABASE_URL, then starts each mode as its own server process on the
+same data and drives the read routes (store directory lookups, /api/get-scores and
+the content endpoints) at each of the given numbers of concurrent connections.
+Like benchmarks.synthetic it refuses to seed a database that already has staff
+unless --reset is given, which drops and recreates every table; --no-seed uses
+the data already there.
+
+    python -m benchmarks.serving --scale medium --concurrency 8,32,128 --duration 20 --reset
+
+Needs uvicorn, plus aiosqlite when running against the SQLite stand-in.
+"""
+import argparse
+import json
+import logging
+import os
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+from benchmarks import PooledWSGIServer, load_app
+from benchmarks import synthetic
+from benchmarks.loadtest import DEFAULT_MIX, Samples, git_commit, run
+
+READ_ROUTES = ('countries', 'companies', 'branches', 'get-store-id', 'get-scores',
+               'questions', 'learning-resources', 'content-version')
+
+
+def serve_sync(port, threads):
+    # Entry point for the sync server process
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    module = load_app()
+    PooledWSGIServer('127.0.0.1', port, module.app, threads).serve_forever()
+
+
+def start_server(mode, port, threads):
+    if mode == 'sync':
+        command = [sys.executable, '-m', 'benchmarks.serving', '--serve-sync', str(port), '--sync-threads', str(threads)]
+    else:
+        command = [sys.executable, '-m', 'uvicorn', 'asgi:create_app', '--factory',
+                   '--port', str(port), '--log-level', 'warning', '--no-access-log']
+    process = subprocess.Popen(command, env=os.environ.copy())
+
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(f'http://127.0.0.1:{port}/api/content-version', timeout=1).read()
+            return process
+        except (urllib.error.URLError, ConnectionError):
+            if process.poll() is not None:
+                raise SystemExit(f'{mode} server exited with status {process.returncode}')
+            time.sleep(0.2)
+    process.terminate()
+    raise SystemExit(f'{mode} server did not start')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    synthetic.add_arguments(parser)
+    parser.add_argument('--no-seed', action='store_true', help='use the data already in DATABASE_URL')
+    parser.add_argument('--reset', action='store_true', help='drop and recreate every table before seeding')
+    parser.add_argument('--concurrency', default='8,32,128', help='comma separated connection counts')
+    parser.add_argument('--duration', type=float, default=20.0, help='measured seconds per mode and level')
+    parser.add_argument('--warmup', type=float, default=2.0)
+    parser.add_argument('--sync-threads', type=int, default=16, help='request threads for the sync server')
+    parser.add_argument('--port', type=int, default=8701)
+    parser.add_argument('--serve-sync', type=int, metavar='PORT', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve_sync:
+        return serve_sync(args.serve_sync, args.sync_threads)
+
+    module = load_app(BCRYPT_ROUNDS=args.bcrypt_rounds)
+    data = None
+    if not args.no_seed:
+        with module.app.app_context():
+            synthetic.prepare_database(module, args.reset)
+            data = synthetic.generate_from_args(module, args)
+    samples = Samples(module)
+    mix = {route: DEFAULT_MIX[route] for route in READ_ROUTES}
+    levels = [int(level) for level in args.concurrency.split(',')]
+
+    with module.app.app_context():
+        database = module.db.engine.dialect.name
+
+    results = {}
+    for offset, mode in enumerate(('sync', 'async')):
+        port = args.port + offset
+        process = start_server(mode, port, args.sync_threads)
+        try:
+            results[mode] = {}
+            for level in levels:
+                total, routes = run(f'http://127.0.0.1:{port}', samples, mix, level,
+                                    args.duration, args.warmup, args.seed)
+                results[mode][str(level)] = {'total': total, 'routes': routes}
+        finally:
+            # SIGTERM, so the servers' graceful shutdown runs as it would in production
+            process.terminate()
+            process.wait(timeout=30)
+
+    print(json.dumps({
+        'commit': git_commit(),
+        'config': {
+            'database': database,
+            'sync_threads': args.sync_threads,
+            'concurrency': levels,
+            'duration': args.duration,
+            'mix': mix,
+        },
+        'data': data,
+        'summary': {
+            mode: {level: {key: result['total'][key] for key in ('throughput_rps', 'p50', 'p99', 'errors')}
+                   for level, result in levels_results.items()}
+            for mode, levels_results in results.items()
+        },
+        'modes': results,
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
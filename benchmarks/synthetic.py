@@ -0,0 +1,169 @@
+"""Synthetic franchises, stores, staff and scores at a configurable scale.
+
+Writes into DATABASE_URL (PostgreSQL, or SQLite as a stand-in) and refuses to
+touch a database that already has staff unless --reset is given, which drops
+and recreates every table. Every staff member gets the same password,
+PASSWORD, so the load test can log in as anyone.
+
+    DATABASE_URL=postgresql://localhost/hairtite_bench python -m benchmarks.synthetic --scale large --reset
+"""
+import argparse
+import json
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+from benchmarks import load_app
+from password_hashing import PasswordHasher
+
+PASSWORD = 'benchmark-password'
+CHUNK = 10000
+
+# franchises, stores per franchise, staff per store, scores per staff
+SCALES = {
+    'small': (5, 10, 10, 20),              # 500 staff, 10k scores
+    'medium': (20, 25, 20, 50),            # 10k staff, 500k scores
+    'large': (40, 50, 25, 80),             # 50k staff, 4M scores
+}
+
+COUNTRIES = ['United Kingdom', 'United States', 'Canada', 'Australia', 'Germany', 'France', 'Ireland', 'Spain']
+
+
+def insert_chunked(module, table, rows):
+    # rows may be a generator, only CHUNK of them are built at a time
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == CHUNK:
+            module.db.session.execute(module.db.insert(table), chunk)
+            chunk = []
+    if chunk:
+        module.db.session.execute(module.db.insert(table), chunk)
+
+
+def generate(module, franchises, stores_per_franchise, staff_per_store, scores_per_staff,
+             days=90, rounds=12, seed=0, questions=20, resources=5):
+    rng = random.Random(seed)
+    db = module.db
+    counts = {}
+
+    names = [f'Franchise {i:03d}' for i in range(franchises)]
+    insert_chunked(module, module.Franchise, ({'name': name} for name in names))
+    franchise_ids = [franchise_id for franchise_id, in
+                     db.session.query(module.Franchise.franchise_id).order_by(module.Franchise.franchise_id)]
+
+    insert_chunked(module, module.Store, (
+        {'country': rng.choice(COUNTRIES), 'franchise_id': franchise_id, 'branch': f'Branch {i:03d}'}
+        for franchise_id in franchise_ids
+        for i in range(stores_per_franchise)
+    ))
+    store_ids = [store_id for store_id, in db.session.query(module.Store.store_id).order_by(module.Store.store_id)]
+
+    # One real hash shared by everyone, hashing per row would dominate the run
+    password = PasswordHasher(workers=0, rounds=rounds).hash(PASSWORD)
+    insert_chunked(module, module.Staff, (
+        {
+            'full_name': f'Staff {store_id}-{i}',
+            'email': f'staff{store_id}-{i}@bench.example',
+            'birthday': date(1970, 1, 1) + timedelta(days=rng.randrange(365 * 35)),
+            'store_id': store_id,
+            'password': password
+        }
+        for store_id in store_ids
+        for i in range(staff_per_store)
+    ))
+    staff_ids = [staff_id for staff_id, in db.session.query(module.Staff.staff_id).order_by(module.Staff.staff_id)]
+
+    now = datetime.now().replace(microsecond=0)
+    insert_chunked(module, module.Score, (
+        {
+            'date': now - timedelta(seconds=rng.randrange(days * 86400)),
+            'staff_id': staff_id,
+            'score': rng.randint(40, 100)
+        }
+        for staff_id in staff_ids
+        for _ in range(scores_per_staff)
+    ))
+
+    insert_chunked(module, module.Question, (
+        {
+            'question': f'Synthetic question {i}?',
+            'answer': rng.random() < 0.5,
+            'info': ' '.join(['Background on why this matters for food safety.'] * rng.randint(5, 30)),
+            'followup': f'Synthetic follow-up statement {i}.',
+            'fanswer': rng.random() < 0.5
+        }
+        for i in range(questions)
+    ))
+    insert_chunked(module, module.LearningResource, (
+        {
+            'title': f'Synthetic resource {i}',
+            'description': '- Watch this video to find out!\n' * rng.randint(1, 5),
+            'url': f'https://example.com/resources/{i}'
+        }
+        for i in range(resources)
+    ))
+    db.session.commit()
+
+    module.rebuild_score_rollups()
+
+    counts.update(franchises=len(franchise_ids), stores=len(store_ids), staff=len(staff_ids),
+                  scores=len(staff_ids) * scores_per_staff, questions=questions, learning_resources=resources)
+    return counts
+
+
+def add_arguments(parser):
+    parser.add_argument('--scale', choices=SCALES, default='small')
+    parser.add_argument('--franchises', type=int, help='overrides --scale')
+    parser.add_argument('--stores-per-franchise', type=int, help='overrides --scale')
+    parser.add_argument('--staff-per-store', type=int, help='overrides --scale')
+    parser.add_argument('--scores-per-staff', type=int, help='overrides --scale')
+    parser.add_argument('--days', type=int, default=90, help='spread scores over this many days')
+    parser.add_argument('--bcrypt-rounds', type=int, default=12)
+    parser.add_argument('--seed', type=int, default=0, help='random seed, same seed gives the same data')
+
+
+def generate_from_args(module, args):
+    franchises, stores, staff, scores = SCALES[args.scale]
+    return generate(
+        module,
+        franchises=args.franchises or franchises,
+        stores_per_franchise=args.stores_per_franchise or stores,
+        staff_per_store=args.staff_per_store or staff,
+        scores_per_staff=args.scores_per_staff if args.scores_per_staff is not None else scores,
+        days=args.days,
+        rounds=args.bcrypt_rounds,
+        seed=args.seed
+    )
+
+
+def prepare_database(module, reset):
+    # Call inside an app context; only drops tables when reset is asked for explicitly
+    if reset:
+        module.db.drop_all()
+        module.db.create_all()
+    elif module.db.session.query(module.Staff).first() is not None:
+        sys.exit('Database already has staff, pass --reset to drop and recreate it')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    add_arguments(parser)
+    parser.add_argument('--reset', action='store_true', help='drop and recreate every table first')
+    args = parser.parse_args()
+
+    module = load_app(BCRYPT_ROUNDS=args.bcrypt_rounds)
+    with module.app.app_context():
+        prepare_database(module, args.reset)
+
+        started = time.perf_counter()
+        counts = generate_from_args(module, args)
+        counts['seconds'] = round(time.perf_counter() - started, 2)
+        counts['database'] = module.db.engine.dialect.name
+
+    print(json.dumps(counts, indent=2))
+
+
+if __name__ == '__main__':
+    main()
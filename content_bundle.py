@@ -0,0 +1,63 @@
+"""Pre-rendered, pre-compressed response bodies for static content endpoints.
+
+The quiz questions and learning resources only change when someone edits the
+tables, so each payload is rendered to JSON once, compressed once per encoding
+and served from memory with a strong ETag until the rows change, with each
+bundle cached by SnapshotCache.
+"""
+import gzip
+import hashlib
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, gzip is always available
+    brotli = None
+
+from snapshot_cache import SnapshotCache
+
+
+class ContentBundle:
+    def __init__(self, body):
+        self.etag = hashlib.sha256(body).hexdigest()[:32]
+        # In order of preference, best_match picks the first of equally acceptable encodings
+        self.variants = {}
+        if brotli is not None:
+            self.variants['br'] = brotli.compress(body, quality=11)
+        self.variants['gzip'] = gzip.compress(body, compresslevel=9)
+        self.variants['identity'] = body
+
+    def variant_etag(self, encoding):
+        # Each encoding is a different representation, so it gets its own strong validator
+        return self.etag if encoding == 'identity' else f'{self.etag}-{encoding}'
+
+    def variant_etags(self):
+        return [self.variant_etag(encoding) for encoding in self.variants]
+
+
+class ContentBundles:
+    def __init__(self, ttl=300):
+        self._ttl = ttl
+        self._caches = {}
+
+    def register(self, name, loader):
+        # loader returns the rendered response body as bytes
+        self._caches[name] = SnapshotCache(loader, ContentBundle, self._ttl)
+
+    def names(self):
+        return list(self._caches)
+
+    def invalidate(self, name):
+        self._caches[name].invalidate()
+
+    def cached(self, name):
+        return self._caches[name].cached()
+
+    def begin_load(self, name):
+        # Callers that render the body themselves (e.g. with the async engine) pass this to finish_load
+        return self._caches[name].begin_load()
+
+    def finish_load(self, name, generation, body):
+        return self._caches[name].finish_load(generation, body)
+
+    def get(self, name):
+        return self._caches[name].get()
@@ -0,0 +1,61 @@
+"""Connection pool and driver settings shared by the sync (psycopg2) and async (asyncpg) engines.
+
+All of them come from the environment:
+
+    DB_POOL_SIZE                       connections kept open per process (default 10)
+    DB_MAX_OVERFLOW                    extra connections allowed under load (default 10)
+    DB_POOL_TIMEOUT                    seconds to wait for a connection before failing (default 10)
+    DB_POOL_RECYCLE                    seconds before a connection is replaced (default 1800)
+    DB_POOL_PRE_PING                   test connections on checkout (default on)
+    DB_STATEMENT_TIMEOUT_MS            PostgreSQL statement_timeout, unset for none
+    DB_QUERY_CACHE_SIZE                compiled SQL statements cached per engine (default 1000)
+    DB_PREPARED_STATEMENT_CACHE_SIZE   asyncpg prepared statements kept per connection (default 500)
+"""
+import os
+
+
+def _flag(name, default):
+    return os.getenv(name, default).lower() in ('1', 'true', 'yes')
+
+
+def is_sqlite(url):
+    return url.startswith('sqlite')
+
+
+def async_url(url):
+    # Same database through the asyncio driver
+    scheme, _, rest = url.partition('://')
+    if scheme.startswith('sqlite'):
+        return f'sqlite+aiosqlite://{rest}'
+    if scheme.startswith('postgres'):
+        return f'postgresql+asyncpg://{rest}'
+    raise ValueError(f'No async driver configured for {scheme}')
+
+
+def engine_options(url, use_async=False):
+    # SQLite brings its own pool classes and has no server-side settings
+    if is_sqlite(url):
+        return {}
+
+    options = {
+        'pool_size': int(os.getenv('DB_POOL_SIZE', '10')),
+        'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', '10')),
+        'pool_timeout': float(os.getenv('DB_POOL_TIMEOUT', '10')),
+        'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', '1800')),
+        'pool_pre_ping': _flag('DB_POOL_PRE_PING', '1'),
+        'query_cache_size': int(os.getenv('DB_QUERY_CACHE_SIZE', '1000')),
+    }
+
+    statement_timeout = os.getenv('DB_STATEMENT_TIMEOUT_MS')
+    if use_async:
+        # asyncpg prepares every statement; keeping them per connection skips the re-parse on reuse
+        connect_args = {'prepared_statement_cache_size': int(os.getenv('DB_PREPARED_STATEMENT_CACHE_SIZE', '500'))}
+        if statement_timeout:
+            connect_args['server_settings'] = {'statement_timeout': statement_timeout}
+    else:
+        connect_args = {}
+        if statement_timeout:
+            connect_args['options'] = f'-c statement_timeout={statement_timeout}'
+
+    options['connect_args'] = connect_args
+    return options
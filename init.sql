@@ -1,5 +1,10 @@
 -- for hairtiteapp database in psql
 
+DROP TABLE IF EXISTS question_stats;
+DROP TABLE IF EXISTS quiz_answers;
+DROP TABLE IF EXISTS quiz_sessions;
+DROP TABLE IF EXISTS store_daily_scores;
+DROP TABLE IF EXISTS staff_daily_scores;
 DROP TABLE IF EXISTS scores;
 DROP TABLE IF EXISTS staff;
 DROP TABLE IF EXISTS stores;
@@ -40,6 +45,9 @@ CREATE TABLE scores (
     FOREIGN KEY (staff_id) REFERENCES staff(staff_id)
 );
 
+-- Score history is read newest first per staff member, with score_id breaking ties for keyset pagination
+CREATE INDEX scores_staff_date_idx ON scores (staff_id, date DESC, score_id DESC);
+
 -- Add learning resources table
 CREATE TABLE learning_resources (
     resource_id SERIAL PRIMARY KEY,
@@ -57,6 +65,78 @@ CREATE TABLE questions (
     fanswer BOOLEAN NOT NULL
 );
 
+-- Score rollups, kept up to date by the app and rebuilt with `flask --app app backfill-rollups`
+-- Per staff member per day, with the store they were at when the scores were written so leaderboards
+-- don't need a join (a backfill uses each staff member's current store)
+CREATE TABLE staff_daily_scores (
+    staff_id INT NOT NULL,
+    day DATE NOT NULL,
+    store_id INT NOT NULL,
+    franchise_id INT NOT NULL,
+    country VARCHAR(100) NOT NULL,
+    attempts INTEGER NOT NULL,
+    total_score BIGINT NOT NULL,
+    best_score INTEGER NOT NULL,
+    PRIMARY KEY (staff_id, day),
+    FOREIGN KEY (staff_id) REFERENCES staff(staff_id)
+);
+
+CREATE INDEX staff_daily_scores_store_idx ON staff_daily_scores (store_id, day);
+CREATE INDEX staff_daily_scores_franchise_idx ON staff_daily_scores (franchise_id, day);
+CREATE INDEX staff_daily_scores_country_idx ON staff_daily_scores (country, day);
+
+-- Per store per day, split over a few shards by staff_id so concurrent writes in one store rarely
+-- share a row lock; franchise and country summaries add up the store-day rows
+CREATE TABLE store_daily_scores (
+    store_id INT NOT NULL,
+    day DATE NOT NULL,
+    shard SMALLINT NOT NULL,
+    franchise_id INT NOT NULL,
+    country VARCHAR(100) NOT NULL,
+    attempts INTEGER NOT NULL,
+    total_score BIGINT NOT NULL,
+    PRIMARY KEY (store_id, day, shard)
+);
+
+CREATE INDEX store_daily_scores_franchise_idx ON store_daily_scores (franchise_id, day);
+CREATE INDEX store_daily_scores_country_idx ON store_daily_scores (country, day);
+
+-- Quiz sessions: the questions drawn for a staff member and their answer key, graded server-side
+CREATE TABLE quiz_sessions (
+    session_id VARCHAR(32) PRIMARY KEY,
+    staff_id INT NOT NULL,
+    question_ids JSON NOT NULL,
+    answer_key JSON NOT NULL,
+    created_at TIMESTAMP NOT NULL,
+    expires_at TIMESTAMP NOT NULL,
+    submitted_at TIMESTAMP,
+    score INTEGER,
+    FOREIGN KEY (staff_id) REFERENCES staff(staff_id)
+);
+-- Lets purge-quiz-sessions find sessions that expired unsubmitted
+CREATE INDEX quiz_sessions_unsubmitted_idx ON quiz_sessions (expires_at) WHERE submitted_at IS NULL;
+
+-- Outcome of each question in a submitted session
+CREATE TABLE quiz_answers (
+    session_id VARCHAR(32) NOT NULL,
+    question_id INT NOT NULL,
+    correct BOOLEAN NOT NULL,
+    followup_correct BOOLEAN NOT NULL,
+    PRIMARY KEY (session_id, question_id),
+    FOREIGN KEY (session_id) REFERENCES quiz_sessions(session_id)
+);
+
+-- Per-question totals kept up to date on each submission, for the most-missed report.
+-- Each submission adds to one random shard so concurrent submissions don't contend on one row.
+CREATE TABLE question_stats (
+    question_id INT NOT NULL,
+    shard SMALLINT NOT NULL,
+    attempts INTEGER NOT NULL,
+    correct INTEGER NOT NULL,
+    followup_correct INTEGER NOT NULL,
+    PRIMARY KEY (question_id, shard)
+);
+
 -- Create a case-insensitive unique index on the email column
 CREATE UNIQUE INDEX staff_email_lower_idx ON staff (LOWER(email));
 
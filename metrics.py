@@ -0,0 +1,239 @@
+"""Request and database instrumentation exposed in the Prometheus text format.
+
+RequestMetrics hooks every Flask request and every SQLAlchemy engine and pool in
+the process. It records per-route latency, how many queries each request issued
+and how long they took, repeated identical statements within one request (the
+usual sign of an N+1 lazy load), connection-pool checkout waits and connections
+in use. The hot path is a perf_counter call and a dict update under a lock, so
+it is meant to stay on in production.
+"""
+import bisect
+import logging
+import threading
+import time
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import Pool, QueuePool
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+SLOW_LOG_STATEMENTS = 50
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    type = 'counter'
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for labels, value in sorted(values.items()):
+            yield self.name, _labels(self.labelnames, labels), value
+
+
+class Gauge(Counter):
+    type = 'gauge'
+
+    def dec(self, *labels, amount=1):
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram:
+    type = 'histogram'
+
+    def __init__(self, name, help, buckets, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets) + (float('inf'),)
+        self._values = {}  # labels -> [per-bucket counts, sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [[0] * len(self.buckets), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def samples(self):
+        with self._lock:
+            values = {labels: (list(counts), total, count) for labels, (counts, total, count) in self._values.items()}
+        for labels, (counts, total, count) in sorted(values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                yield f'{self.name}_bucket', _labels(self.labelnames, labels, [('le', _number(bound))]), cumulative
+            yield f'{self.name}_sum', _labels(self.labelnames, labels), total
+            yield f'{self.name}_count', _labels(self.labelnames, labels), count
+
+
+class RequestState:
+    # Per-request database accounting, kept on flask.g
+    def __init__(self, collect_statements):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.statement_counts = {}
+        self.statements = [] if collect_statements else None
+
+
+class RequestMetrics:
+    def __init__(self, app=None, slow_request_ms=None, n_plus_one_threshold=5):
+        self.slow_request_ms = slow_request_ms
+        self.n_plus_one_threshold = n_plus_one_threshold
+
+        self.request_duration = Histogram(
+            'http_request_duration_seconds', 'Time spent handling requests', LATENCY_BUCKETS, ('method', 'route'))
+        self.requests = Counter(
+            'http_requests_total', 'Requests handled', ('method', 'route', 'status'))
+        self.request_queries = Histogram(
+            'db_queries_per_request', 'SQL statements issued per request', QUERY_COUNT_BUCKETS, ('route',))
+        self.request_db_time = Histogram(
+            'db_time_per_request_seconds', 'Time spent in SQL per request', LATENCY_BUCKETS, ('route',))
+        self.queries = Counter(
+            'db_queries_total', 'SQL statements executed, including outside requests')
+        self.n_plus_one = Counter(
+            'db_n_plus_one_total', 'Requests that repeated one statement at least the threshold number of times',
+            ('route',))
+        self.pool_wait = Histogram(
+            'db_pool_checkout_wait_seconds', 'Time waiting to check a connection out of the pool', LATENCY_BUCKETS)
+        self.pool_in_use = Gauge(
+            'db_pool_connections_in_use', 'Connections currently checked out of the pool')
+        self.registry = [self.request_duration, self.requests, self.request_queries, self.request_db_time,
+                         self.queries, self.n_plus_one, self.pool_wait, self.pool_in_use]
+
+        self.pool_class = self.timed_pool_class(QueuePool)
+        self._listening = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+
+        # Listening on the classes covers every engine and pool, however and whenever they get created
+        if not self._listening:
+            event.listen(Engine, 'before_cursor_execute', self._before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', self._after_cursor_execute)
+            event.listen(Engine, 'handle_error', self._handle_error)
+            event.listen(Pool, 'checkout', self._checkout)
+            event.listen(Pool, 'checkin', self._checkin)
+            self._listening = True
+
+    def render(self):
+        lines = []
+        for metric in self.registry:
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.type}')
+            lines.extend(f'{name}{labels} {_number(value)}' for name, labels, value in metric.samples())
+        return '\n'.join(lines) + '\n'
+
+    def timed_pool_class(self, base):
+        # SQLAlchemy has no event for the start of a checkout, so time the pool's connect directly
+        observe = self.pool_wait.observe
+
+        class TimedQueuePool(base):
+            def connect(self):
+                started = time.perf_counter()
+                try:
+                    return super().connect()
+                finally:
+                    observe(time.perf_counter() - started)
+
+        return TimedQueuePool
+
+    def _before_request(self):
+        g._request_metrics = RequestState(collect_statements=self.slow_request_ms is not None)
+
+    def _after_request(self, response):
+        state = g.pop('_request_metrics', None)
+        if state is None:
+            return response
+
+        elapsed = time.perf_counter() - state.started
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        self.request_duration.observe(elapsed, request.method, route)
+        self.requests.inc(request.method, route, str(response.status_code))
+        self.request_queries.observe(state.queries, route)
+        self.request_db_time.observe(state.db_seconds, route)
+
+        repeated = [(statement, count) for statement, count in state.statement_counts.items()
+                    if count >= self.n_plus_one_threshold]
+        if repeated:
+            self.n_plus_one.inc(route)
+            statement, count = max(repeated, key=lambda item: item[1])
+            logger.warning('Possible N+1 on %s %s: %d executions of %s', request.method, route, count, statement)
+
+        if self.slow_request_ms is not None and elapsed * 1000 >= self.slow_request_ms:
+            logger.warning(
+                'Slow request %s %s took %.1fms, %d queries in %.1fms:\n%s',
+                request.method, route, elapsed * 1000, state.queries, state.db_seconds * 1000,
+                '\n'.join(f'  {seconds * 1000:.1f}ms {statement}' for statement, seconds in state.statements)
+            )
+        return response
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['query_started'].pop()
+        self.queries.inc()
+
+        # Only requests are attributed, background work (e.g. the score writer) just counts globally
+        if not has_request_context():
+            return
+        state = g.get('_request_metrics')
+        if state is None:
+            return
+        state.queries += 1
+        state.db_seconds += elapsed
+        state.statement_counts[statement] = state.statement_counts.get(statement, 0) + 1
+        if state.statements is not None and len(state.statements) < SLOW_LOG_STATEMENTS:
+            state.statements.append((statement, elapsed))
+
+    def _handle_error(self, context):
+        # after_cursor_execute doesn't run for failed statements, drop their start time
+        started = context.connection.info.get('query_started') if context.connection is not None else None
+        if started:
+            started.pop()
+
+    def _checkout(self, dbapi_connection, connection_record, connection_proxy):
+        self.pool_in_use.inc()
+
+    def _checkin(self, dbapi_connection, connection_record):
+        self.pool_in_use.dec()
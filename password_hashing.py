@@ -0,0 +1,159 @@
+"""bcrypt hashing and verification on a dedicated process pool.
+
+bcrypt is deliberately slow (hundreds of milliseconds of CPU at the default
+cost), so doing it on the request thread lets a burst of logins starve every
+other endpoint. PasswordHasher runs it in worker processes sized to this server
+process's share of the cores (cores / WEB_CONCURRENCY) and admits at most
+max_pending jobs at once; beyond that it raises HasherBusy straight away so the
+caller can answer 503 instead of queueing.
+
+The caller's thread still waits for its job, so max_pending has to stay below
+the server's request threads (it defaults to one job per worker). Otherwise a
+login storm can occupy every request thread before anything is shed.
+
+Bulk imports (hash_many) don't take those slots. They keep at most
+import_share hashes in the pool at a time (half the workers by default), so a
+login that arrives mid-import queues behind a few import hashes rather than
+the whole batch.
+"""
+import math
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import bcrypt
+
+
+class HasherBusy(Exception):
+    def __init__(self, retry_after):
+        super().__init__('Password hashing is at capacity')
+        self.retry_after = retry_after
+
+
+def _hash(password, rounds):
+    return bcrypt.hashpw(password, bcrypt.gensalt(rounds))
+
+
+def _check(password, hashed):
+    return bcrypt.checkpw(password, hashed)
+
+
+def hash_rounds(hashed):
+    # bcrypt hashes look like $2b$12$<salt+hash>, the second field is the cost factor
+    try:
+        return int(hashed.split('$')[2])
+    except (IndexError, ValueError):
+        return None
+
+
+class PasswordHasher:
+    def __init__(self, workers=None, max_pending=None, rounds=12, import_share=None):
+        # workers=0 hashes inline on the calling thread, as before the pool existed. The default
+        # splits the cores between the server processes on the host (WEB_CONCURRENCY, as read by
+        # uvicorn and gunicorn), so N server processes don't start N pools of one worker per core.
+        if workers is None:
+            workers = max((os.cpu_count() or 1) // int(os.getenv('WEB_CONCURRENCY', '1')), 1)
+        self.workers = workers
+        self.max_pending = max_pending or max(self.workers, 1)
+        self.import_share = import_share or max(self.workers // 2, 1)
+        self.rounds = rounds
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._import_slots = threading.BoundedSemaphore(self.import_share)
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        self._average_seconds = 0.25  # moving average of one job, used for Retry-After
+
+    def hash(self, password):
+        return self._run(_hash, password.encode('utf-8'), self.rounds).decode('utf-8')
+
+    def hash_many(self, passwords, rounds=None):
+        # For bulk imports: hashes are submitted one at a time as import slots free up, so logins
+        # submitted meanwhile are interleaved with the batch instead of queued behind all of it
+        encoded = [password.encode('utf-8') for password in passwords]
+        rounds = rounds or self.rounds
+        if not self.workers:
+            return [_hash(password, rounds).decode('utf-8') for password in encoded]
+
+        futures = []
+        for password in encoded:
+            self._import_slots.acquire()
+            try:
+                future = self._submit(_hash, password, rounds)
+            except BaseException:
+                self._import_slots.release()
+                raise
+            future.add_done_callback(lambda future: self._import_slots.release())
+            futures.append(future)
+
+        hashed = []
+        for future, password in zip(futures, encoded):
+            try:
+                hashed.append(future.result())
+            except BrokenProcessPool:
+                hashed.append(self._call(_hash, password, rounds))
+        return [value.decode('utf-8') for value in hashed]
+
+    def check(self, password, hashed):
+        return self._run(_check, password.encode('utf-8'), hashed.encode('utf-8'))
+
+    def needs_rehash(self, hashed):
+        return hash_rounds(hashed) != self.rounds
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+
+    def _run(self, func, *args):
+        if not self._slots.acquire(blocking=False):
+            raise HasherBusy(self._retry_after())
+
+        started = time.monotonic()
+        try:
+            if self.workers:
+                result = self._call(func, *args)
+            else:
+                result = func(*args)
+        finally:
+            self._slots.release()
+
+        self._average_seconds = 0.9 * self._average_seconds + 0.1 * (time.monotonic() - started)
+        return result
+
+    def _call(self, func, *args):
+        pool = self._executor()
+        try:
+            return pool.submit(func, *args).result()
+        except BrokenProcessPool:
+            # A worker died (e.g. OOM-killed), which breaks the whole pool; replace it
+            # so later calls don't all fail, and retry this job once on the new one
+            self._discard(pool)
+            return self._executor().submit(func, *args).result()
+
+    def _submit(self, func, *args):
+        pool = self._executor()
+        try:
+            return pool.submit(func, *args)
+        except BrokenProcessPool:
+            self._discard(pool)
+            return self._executor().submit(func, *args)
+
+    def _discard(self, pool):
+        with self._pool_lock:
+            if self._pool is pool:
+                self._pool = None
+        pool.shutdown(wait=False)
+
+    def _executor(self):
+        # Created on first use so each server worker process forks its own pool
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        return self._pool
+
+    def _retry_after(self):
+        # Roughly how long until the jobs already admitted have drained
+        return max(1, math.ceil(self._average_seconds * self.max_pending / max(self.workers, 1)))
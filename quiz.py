@@ -0,0 +1,75 @@
+"""Server-side quiz sessions: the cached question bank and grading.
+
+A session is a random draw from the question bank. The client gets only the
+question and follow-up text, and the answer key for the draw is stored with
+the session when it is issued. A submission is graded against that stored key
+in one pass, so grading doesn't read the questions table, and editing a
+question doesn't change the key for sessions that are already running.
+
+The bank is loaded with one query and cached by SnapshotCache until a question
+is written.
+"""
+import operator
+import random
+
+from snapshot_cache import SnapshotCache
+
+
+class QuestionBankSnapshot:
+    def __init__(self, rows):
+        # rows are (question_id, question, followup, answer, fanswer, info) ordered by question_id
+        self.question_ids = tuple(row[0] for row in rows)
+        self.answer_keys = {row[0]: (row[3], row[4]) for row in rows}
+        self.info = {row[0]: row[5] for row in rows}
+        # What the client sees, built once per snapshot rather than per session
+        self.public = {row[0]: {'question_id': row[0], 'question': row[1], 'followup': row[2]} for row in rows}
+
+    def draw(self, count):
+        # Returns (question_ids, answer_key) for a random subset of count questions
+        question_ids = random.sample(self.question_ids, min(count, len(self.question_ids)))
+        return question_ids, [list(self.answer_keys[question_id]) for question_id in question_ids]
+
+
+class QuestionBank(SnapshotCache):
+    def __init__(self, loader, ttl=300):
+        # loader returns the rows described in QuestionBankSnapshot
+        super().__init__(loader, QuestionBankSnapshot, ttl)
+
+    def snapshot(self):
+        return self.get()
+
+
+def parse_answers(question_ids, answers):
+    # Returns the submitted (answer, fanswer) pairs in session order, or raises ValueError
+    if not isinstance(answers, list):
+        raise ValueError('answers must be a list')
+
+    submitted = {}
+    for answer in answers:
+        if not isinstance(answer, dict) or not isinstance(answer.get('question_id'), int):
+            raise ValueError('Each answer needs an integer question_id')
+        if not isinstance(answer.get('answer'), bool) or not isinstance(answer.get('fanswer'), bool):
+            raise ValueError(f'answer and fanswer for question {answer["question_id"]} must be booleans')
+        if answer['question_id'] in submitted:
+            raise ValueError(f'Question {answer["question_id"]} answered twice')
+        submitted[answer['question_id']] = (answer['answer'], answer['fanswer'])
+
+    unknown = submitted.keys() - set(question_ids)
+    if unknown:
+        raise ValueError(f'Questions not in this session: {sorted(unknown)}')
+    missing = [question_id for question_id in question_ids if question_id not in submitted]
+    if missing:
+        raise ValueError(f'Missing answers for questions: {missing}')
+
+    return [submitted[question_id] for question_id in question_ids]
+
+
+def grade(answer_key, submitted):
+    # Element-wise comparison of the two answer columns against the key; returns
+    # [(answer_correct, fanswer_correct)] in session order and the score out of 100
+    expected_answers, expected_fanswers = zip(*answer_key)
+    given_answers, given_fanswers = zip(*submitted)
+    outcomes = list(zip(map(operator.eq, given_answers, expected_answers),
+                        map(operator.eq, given_fanswers, expected_fanswers)))
+    correct = sum(answer + fanswer for answer, fanswer in outcomes)
+    return outcomes, round(100 * correct / (2 * len(outcomes)))
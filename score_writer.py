@@ -0,0 +1,74 @@
+"""Write-behind queue for quiz scores.
+
+Records are queued in-process and handed to a flush callback in batches, either
+when batch_size records are waiting or flush_interval seconds have passed since
+the oldest one was queued. close() stops the worker after draining the queue.
+Anything still queued when the process dies hard is lost, which is the trade
+off for not committing once per request.
+"""
+import logging
+import queue
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class ScoreWriter:
+    def __init__(self, flush, batch_size=500, flush_interval=1.0, max_queue=100000, submit_timeout=1.0):
+        self._flush = flush  # called with a list of record dicts
+        self._batch_size = batch_size
+        self._flush_interval = flush_interval
+        self._submit_timeout = submit_timeout
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name='score-writer', daemon=True)
+        self._thread.start()
+
+    def submit(self, record):
+        if self._closed:
+            raise RuntimeError('Score writer is closed')
+        # Waits at most submit_timeout when the queue is full (e.g. the database has stalled),
+        # then raises queue.Full so the caller can shed the request rather than hang
+        self._queue.put(record, timeout=self._submit_timeout)
+
+    def close(self, timeout=30):
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+    def _run(self):
+        batch = []
+        deadline = None
+        stopping = False
+
+        while not stopping:
+            timeout = None if deadline is None else max(deadline - time.monotonic(), 0)
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            if item is _STOP:
+                stopping = True
+            elif item is not None:
+                if not batch:
+                    deadline = time.monotonic() + self._flush_interval
+                batch.append(item)
+                if len(batch) < self._batch_size:
+                    continue
+
+            if batch:
+                self._write(batch)
+                batch = []
+                deadline = None
+
+    def _write(self, batch):
+        try:
+            self._flush(batch)
+        except Exception:
+            logger.exception('Failed to write %d queued scores', len(batch))
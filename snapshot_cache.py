@@ -0,0 +1,56 @@
+"""Process-local cache of one value built from database rows.
+
+Used for the store directory, the content bundles and the quiz question bank.
+The value is kept until invalidate() is called (after a commit that wrote the
+underlying tables) or the TTL runs out; other worker processes don't see our
+invalidations, so the TTL bounds how stale they can get.
+
+Loads race with invalidations: every invalidate() bumps a generation counter,
+and a load only stores its result if the generation hasn't moved since it
+started, so rows read before a write can't be cached after it.
+"""
+import threading
+import time
+
+
+class SnapshotCache:
+    def __init__(self, loader, build, ttl=300):
+        self._loader = loader  # returns whatever build takes, usually rows
+        self._build = build  # turns the loaded data into the cached value
+        self._ttl = ttl
+        self._lock = threading.Lock()
+        self._value = None
+        self._loaded_at = 0.0
+        self._generation = 0
+
+    def invalidate(self):
+        with self._lock:
+            self._generation += 1
+            self._value = None
+
+    def cached(self):
+        value = self._value
+        if value is not None and (not self._ttl or time.monotonic() - self._loaded_at < self._ttl):
+            return value
+        return None
+
+    def begin_load(self):
+        # Callers that fetch the data themselves (e.g. with the async engine) pass this to finish_load
+        with self._lock:
+            return self._generation
+
+    def finish_load(self, generation, data):
+        value = self._build(data)
+        with self._lock:
+            # A write committed while we were loading, so don't cache what we read
+            if generation == self._generation:
+                self._value = value
+                self._loaded_at = time.monotonic()
+        return value
+
+    def get(self):
+        value = self.cached()
+        if value is None:
+            generation = self.begin_load()
+            value = self.finish_load(generation, self._loader())
+        return value
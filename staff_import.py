@@ -0,0 +1,95 @@
+"""Parsing and row-level validation for bulk staff onboarding.
+
+Records come from a CSV file (header row with full_name, email, password and
+optionally birthday and store_id) or a JSON list of objects with the same keys.
+validate_records checks each row on its own and drops repeated emails within the
+import, compared case-insensitively like the staff_email_lower_idx index. The
+checks that need the database (known store_ids, emails already registered) are
+done set-wise by the caller.
+"""
+import csv
+import io
+from datetime import datetime
+
+REQUIRED = ('full_name', 'email', 'password')
+MAX_LENGTH = 255
+
+
+class ImportRow:
+    def __init__(self, row, full_name, email, password, birthday, store_id):
+        self.row = row  # 1-based position in the import, the header line not counted
+        self.full_name = full_name
+        self.email = email
+        self.email_key = email.lower()
+        self.password = password
+        self.birthday = birthday
+        self.store_id = store_id
+
+
+def parse_csv(text):
+    reader = csv.DictReader(io.StringIO(text))
+    missing = [column for column in REQUIRED if column not in (reader.fieldnames or [])]
+    if missing:
+        raise ValueError(f'CSV is missing columns: {", ".join(missing)}')
+    return list(reader)
+
+
+def _clean(record, key):
+    value = record.get(key)
+    return value.strip() if isinstance(value, str) else value
+
+
+def validate_record(index, record, default_store_id):
+    if not isinstance(record, dict):
+        raise ValueError('Row must be an object')
+
+    for key in REQUIRED:
+        if not isinstance(record.get(key), str) or not record[key].strip():
+            raise ValueError(f'Missing {key}')
+
+    full_name = _clean(record, 'full_name')
+    email = _clean(record, 'email')
+    if len(full_name) > MAX_LENGTH or len(email) > MAX_LENGTH:
+        raise ValueError(f'full_name and email must be at most {MAX_LENGTH} characters')
+    if '@' not in email or email.startswith('@') or email.endswith('@'):
+        raise ValueError('Invalid email')
+
+    birthday = None
+    if _clean(record, 'birthday'):
+        # Same format as /signup
+        try:
+            birthday = datetime.strptime(_clean(record, 'birthday'), '%d/%m/%Y').date()
+        except (TypeError, ValueError):
+            raise ValueError('birthday must be dd/mm/yyyy')
+
+    store_id = _clean(record, 'store_id') or default_store_id
+    try:
+        store_id = int(store_id)
+    except (TypeError, ValueError):
+        raise ValueError('Missing or invalid store_id')
+
+    return ImportRow(index + 1, full_name, email, record['password'], birthday, store_id)
+
+
+def validate_records(records, default_store_id=None):
+    # Returns (rows, errors); errors are {'row', 'email', 'message'} dicts
+    rows = []
+    errors = []
+    seen = {}
+
+    for index, record in enumerate(records):
+        try:
+            row = validate_record(index, record, default_store_id)
+        except ValueError as e:
+            email = _clean(record, 'email') if isinstance(record, dict) else None
+            errors.append({'row': index + 1, 'email': email, 'message': str(e)})
+            continue
+
+        if row.email_key in seen:
+            errors.append({'row': row.row, 'email': row.email,
+                           'message': f'Duplicate of row {seen[row.email_key]} in this import'})
+            continue
+        seen[row.email_key] = row.row
+        rows.append(row)
+
+    return rows, errors
@@ -0,0 +1,48 @@
+"""Process-local index of the country -> company -> branch -> store_id hierarchy.
+
+The onboarding lookups (/api/countries, /api/companies, /api/branches and
+/get-store-id) are all answered from one snapshot that is built with a single
+query and cached by SnapshotCache until a store or franchise is written.
+"""
+import hashlib
+import json
+
+from snapshot_cache import SnapshotCache
+
+
+class DirectorySnapshot:
+    def __init__(self, rows):
+        # rows are (franchise_name, country, branch, store_id) ordered by store_id,
+        # with None store columns for franchises that have no stores yet
+        self.franchises = set()
+        self.store_ids = {}
+        companies = {}
+        branches = {}
+
+        for franchise, country, branch, store_id in rows:
+            self.franchises.add(franchise)
+            if store_id is None:
+                continue
+            companies.setdefault(country, set()).add(franchise)
+            branches.setdefault((country, franchise), set()).add(branch)
+            # Keep the lowest store_id, matching the old .first() lookup
+            self.store_ids.setdefault((country, franchise, branch), store_id)
+
+        self.countries = sorted(companies)
+        self.companies = {country: sorted(names) for country, names in companies.items()}
+        self.branches = {key: sorted(names) for key, names in branches.items()}
+
+        digest = hashlib.sha1(json.dumps(
+            sorted([list(key), store_id] for key, store_id in self.store_ids.items())
+            + sorted(self.franchises)
+        ).encode('utf-8'))
+        self.version = digest.hexdigest()[:16]
+
+
+class StoreDirectory(SnapshotCache):
+    def __init__(self, loader, ttl=300):
+        # loader returns the rows described in DirectorySnapshot
+        super().__init__(loader, DirectorySnapshot, ttl)
+
+    def snapshot(self):
+        return self.get()